@@ -6,7 +6,12 @@ import os
 import signal
 import sys
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from src.utils.logging_config import get_logger
 from src.greengrass_mqtt import GreengrassSDKClient
@@ -16,9 +21,9 @@ logger = get_logger(__name__)
 
 # Global variables for clean shutdown
 service = None
-shutdown_event = asyncio.Event()
+shutdown_event: Optional[asyncio.Event] = None
 
-def signal_handler(sig, frame):
+def signal_handler(sig):
     """Handle termination signals"""
     logger.info(f"Received signal {sig}, shutting down...")
     shutdown_event.set()
@@ -49,7 +54,7 @@ class S3CommandComponent:
         self.idle_process_interval = idle_process_interval
         
         # Create the MQTT client
-        self.mqtt_client = GreengrassSDKClient()
+        self.mqtt_client = GreengrassSDKClient(thing_name)
         
         # Create the S3 command service
         self.command_service = S3CommandService(
@@ -120,9 +125,12 @@ async def main():
     parser.add_argument('--idle-process-interval', type=float, default=60.0, help='Status update interval when idle in seconds')
     args = parser.parse_args()
     
-    # Register signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    # Register signal handlers on the running loop
+    global shutdown_event
+    shutdown_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, signal_handler, sig)
     
     # Create and start the component
     global service
@@ -140,23 +148,41 @@ async def main():
         logger.error("Failed to start S3 command component")
         return 1
         
-    # Keep running until shutdown
+    # Keep running until shutdown is requested or the IPC connection is lost
+    exit_code = 0
+    shutdown_task = asyncio.create_task(shutdown_event.wait())
     try:
-        while not shutdown_event.is_set():
-            await asyncio.sleep(1.0)
+        done, _ = await asyncio.wait(
+            [shutdown_task, service.mqtt_client.closed_future],
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        if service.mqtt_client.closed_future in done:
+            logger.error("Lost connection to Greengrass Core IPC, shutting down")
+            exit_code = 1
     except asyncio.CancelledError:
         logger.info("Main task cancelled")
     finally:
+        shutdown_task.cancel()
         # Stop the component
         if service:
             await service.stop()
     
     logger.info("S3 command component exited")
-    return 0
+    return exit_code
+
+def run() -> int:
+    """Run main() on uvloop when it is installed, otherwise on the default event loop"""
+    if uvloop is None:
+        return asyncio.run(main())
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(main())
+    uvloop.install()
+    return asyncio.run(main())
 
 if __name__ == "__main__":
     try:
-        exit_code = asyncio.run(main())
+        exit_code = run()
         sys.exit(exit_code)
     except KeyboardInterrupt:
         logger.info("Program interrupted")
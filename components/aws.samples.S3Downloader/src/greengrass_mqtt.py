@@ -1,27 +1,91 @@
 import asyncio
-import json
-from typing import Dict, Any, Callable, Awaitable, Optional
-import traceback
+import functools
+import logging
+import threading
+import uuid
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, List, NamedTuple, Optional, Tuple
 
 from .utils.logging_config import get_logger
+from .utils.json_utils import LazyJson, dumps, dumps_bytes, loads
 from .mqtt_interface import MQTTInterface
 from awsiot.greengrasscoreipc.clientv2 import GreengrassCoreIPCClientV2
 
 logger = get_logger(__name__)
 
+
+def _resolve_accepted(future: asyncio.Future, payload: Dict[str, Any]) -> None:
+    """Complete a pending shadow request with its accepted response"""
+    future.set_result(payload)
+
+
+def _resolve_rejected(future: asyncio.Future, payload: Dict[str, Any]) -> None:
+    """Fail a pending shadow request with its rejected response"""
+    # Rejections carry an error code and message; only serialize the payload when they are missing
+    if 'message' in payload:
+        error = f"Shadow request rejected ({payload.get('code')}): {payload['message']}"
+    else:
+        error = f"Shadow request rejected: {dumps(payload)}"
+    future.set_exception(Exception(error))
+
+
+class ShadowTopics(NamedTuple):
+    """MQTT topics used for operations on one device shadow"""
+    get: str
+    update: str
+    delete: str
+    update_delta: str
+
+
+# Shadow response handlers keyed by the last level of the response topic
+_SHADOW_RESPONSE_HANDLERS = {
+    "accepted": _resolve_accepted,
+    "rejected": _resolve_rejected
+}
+
+# Maximum number of received messages waiting to be dispatched
+INBOX_MAX_SIZE = 1024
+# Maximum number of subscription callbacks running at the same time
+MAX_CONCURRENT_CALLBACKS = 32
+
 class GreengrassSDKClient(MQTTInterface):
     """
     Greengrass SDK implementation of the MQTT interface using ClientV2
     """
     
-    def __init__(self):
-        """Initialize the Greengrass SDK client"""
+    def __init__(self, thing_name: Optional[str] = None):
+        """
+        Initialize the Greengrass SDK client
+        
+        Args:
+            thing_name: AWS IoT Thing name whose shadow response topics are subscribed on connect
+        """
         self.client = None
+        self.thing_name = thing_name
         self.subscriptions = {}
         self.connected = False
         self.subscription_operations = {}
         self.event_loop = None
         self.callback_thread = None
+        self._loop_thread_id: Optional[int] = None
+        
+        # Pending shadow requests keyed by clientToken
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Things whose shadow response topics are already subscribed
+        self._shadow_subscribed_things = set()
+        # Serializes subscribing to shadow response topics
+        self._shadow_subscribe_lock = asyncio.Lock()
+        
+        # Bounded hand-off between the IPC callback thread and the event loop
+        self._inbox: Optional[asyncio.Queue] = None
+        self._inbox_task: Optional[asyncio.Task] = None
+        self._callback_tasks = set()
+        # Parsed messages waiting for a callback slot, started as running callbacks finish
+        self._waiting_callbacks = deque()
+        self._dropped_messages = 0
+        
+        # Resolved when a subscription stream closes without being unsubscribed
+        self.closed_future: Optional[asyncio.Future] = None
         
     async def connect(self) -> bool:
         """
@@ -30,20 +94,35 @@ class GreengrassSDKClient(MQTTInterface):
         Returns:
             Success status
         """
+        if self.connected and self.client:
+            return True
+            
         logger.info("Connecting to AWS IoT Core via Greengrass")
         
         try:
             # Store the current event loop for callbacks
             self.event_loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
             
-            # Initialize the IPC client v2
-            self.client = GreengrassCoreIPCClientV2()
+            # Initialize the IPC client v2 off the event loop; it connects to the nucleus synchronously
+            self.client = await asyncio.to_thread(GreengrassCoreIPCClientV2)
             self.connected = True
+            self.closed_future = self.event_loop.create_future()
+            
+            # Start the consumer that dispatches received messages to callbacks
+            self._inbox = asyncio.Queue(maxsize=INBOX_MAX_SIZE)
+            self._inbox_task = asyncio.create_task(self._drain_inbox())
+            
             logger.info("Successfully connected to Greengrass Core IPC")
+            
+            # Subscribe once to the shadow response topics; shadow requests retry the
+            # missing subscriptions, but until then they cannot receive responses
+            if self.thing_name and not await self._subscribe_shadow_responses(self.thing_name):
+                logger.warning("Failed to subscribe to shadow response topics for %s; "
+                               "shadow requests will retry the subscription", self.thing_name)
             return True
         except Exception as e:
-            logger.error(f"Failed to connect to Greengrass Core IPC: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to connect to Greengrass Core IPC: %s", e)
             self.connected = False
             return False
         
@@ -54,23 +133,48 @@ class GreengrassSDKClient(MQTTInterface):
         logger.info("Disconnecting from AWS IoT Core")
         
         try:
-            # Cancel all subscription operations
-            for operation in self.subscription_operations.values():
-                if hasattr(operation, 'close'):
-                    operation.close()
-                
-            # Clear subscription references
+            # Clear subscription references first so the closures are not reported as connection loss
+            operations = list(self.subscription_operations.values())
             self.subscription_operations.clear()
             self.subscriptions.clear()
             
+            # Close all subscription operations concurrently; each close is a blocking IPC call
+            await asyncio.gather(
+                *(asyncio.to_thread(operation.close) for operation in operations if hasattr(operation, 'close')),
+                return_exceptions=True
+            )
+
+            self._shadow_subscribed_things.clear()
+            
+            # Fail any shadow request still waiting for a response
+            for future in self._pending.values():
+                if not future.done():
+                    future.cancel()
+            self._pending.clear()
+            
+            # Stop dispatching received messages
+            self._waiting_callbacks.clear()
+            if self._inbox_task:
+                self._inbox_task.cancel()
+                try:
+                    await self._inbox_task
+                except asyncio.CancelledError:
+                    pass
+                self._inbox_task = None
+                
+            # Stop callbacks still running, so they do not publish after disconnecting
+            callback_tasks = [task for task in self._callback_tasks if task is not asyncio.current_task()]
+            for task in callback_tasks:
+                task.cancel()
+            await asyncio.gather(*callback_tasks, return_exceptions=True)
+            
             # Set client to None
             self.client = None
             self.connected = False
             logger.info("Successfully disconnected from Greengrass Core IPC")
             return True
         except Exception as e:
-            logger.error(f"Error disconnecting from Greengrass Core IPC: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error disconnecting from Greengrass Core IPC: %s", e)
             return False
         
     async def subscribe(self, topic: str, callback: Callable[[str, Dict[str, Any]], Awaitable[None]]) -> bool:
@@ -81,7 +185,7 @@ class GreengrassSDKClient(MQTTInterface):
             topic: Topic to subscribe to
             callback: Async callback function
         """
-        logger.info(f"Subscribing to {topic}")
+        logger.info("Subscribing to %s", topic)
         
         # Store the callback and the event loop
         self.subscriptions[topic] = callback
@@ -90,42 +194,39 @@ class GreengrassSDKClient(MQTTInterface):
             # Define handlers for stream events
             def on_stream_event(event):
                 try:
-                    # Parse the payload
-                    message = str(event.message.payload, 'utf-8')
-                    logger.info(f'Received message on {topic}: {message}')
-                    payload = json.loads(message)
-
-                    # Log if commandId is in the payload
-                    if 'commandId' in payload:
-                        logger.info(f"Command ID in received message: {payload['commandId']}")
-                    else:
-                        logger.warning(f"No commandId in received message: {json.dumps(payload)}")
-
-                    # Schedule the async callback to run in the event loop
+                    # Only hand the raw message over; parsing happens in the inbox consumer
+                    message = event.message
+                    # Wildcard subscriptions need the concrete topic the message arrived on
+                    message_topic = message.topic_name or topic
+                    
                     if self.event_loop and self.event_loop.is_running():
-                        self.event_loop.call_soon_threadsafe(
-                            lambda: asyncio.create_task(
-                                self._run_callback(topic, payload)
-                            )
-                        )
+                        if threading.get_ident() == self._loop_thread_id:
+                            # Already on the loop thread, no need for a thread-safe hand-off
+                            self._enqueue_message(topic, message_topic, message.payload)
+                        else:
+                            self.event_loop.call_soon_threadsafe(self._enqueue_message, topic, message_topic, message.payload)
                     else:
-                        logger.error(f"Cannot process message - no running event loop")
+                        logger.error("Cannot process message - no running event loop")
                 except Exception as e:
-                    logger.error(f"Error processing message from {topic}: {e}")
-                    logger.error(traceback.format_exc())
+                    logger.exception("Error processing message from %s: %s", topic, e)
             
             # Error handler
             def on_stream_error(error):
-                logger.error(f"Subscription error on {topic}: {error}")
+                logger.error("Subscription error on %s: %s", topic, error)
                 return False  # Keep stream open
             
             # Closed handler
             def on_stream_closed():
-                logger.info(f"Subscription to {topic} closed")
+                logger.info("Subscription to %s closed", topic)
+                # A stream we did not close ourselves means the IPC connection was lost
+                if topic in self.subscription_operations and self.event_loop and not self.event_loop.is_closed():
+                    self.event_loop.call_soon_threadsafe(self._on_connection_lost, topic)
             
             # Subscribe to the IoT Core topic using ClientV2 API
             # The operation returns a tuple with (subscription, operation)
-            _, operation = self.client.subscribe_to_iot_core(
+            # The call blocks on the IPC round-trip, so run it in a worker thread
+            _, operation = await asyncio.to_thread(
+                self.client.subscribe_to_iot_core,
                 topic_name=topic,
                 qos=1,
                 on_stream_event=on_stream_event,
@@ -136,28 +237,145 @@ class GreengrassSDKClient(MQTTInterface):
             # Store the operation for later cleanup
             self.subscription_operations[topic] = operation
             
-            logger.info(f"Successfully subscribed to {topic}")
+            logger.info("Successfully subscribed to %s", topic)
             return True
         except Exception as e:
-            logger.error(f"Failed to subscribe to {topic}: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to subscribe to %s: %s", topic, e)
             return False
     
-    async def _run_callback(self, topic: str, payload: Dict[str, Any]) -> None:
+    def _on_connection_lost(self, topic: str) -> None:
+        """
+        Resolve closed_future after a subscription stream closed unexpectedly
+        
+        Runs on the event loop thread.
+        
+        Args:
+            topic: The topic whose stream was closed
+        """
+        if self.closed_future and not self.closed_future.done():
+            logger.error("Subscription to %s closed unexpectedly, connection to Greengrass Core IPC lost", topic)
+            self.closed_future.set_result(topic)
+    
+    def _enqueue_message(self, subscription: str, topic: str, raw_payload: bytes) -> None:
+        """
+        Queue a received message for dispatch, dropping it if the inbox is full
+        
+        Runs on the event loop thread.
+        
+        Args:
+            subscription: The subscribed topic filter that matched the message
+            topic: The topic the message was received on
+            raw_payload: The undecoded message payload
+        """
+        try:
+            self._inbox.put_nowait((subscription, topic, raw_payload))
+        except asyncio.QueueFull:
+            self._drop_message(topic)
+            
+    def _drop_message(self, topic: str) -> None:
+        """
+        Count a message dropped because the inbox or the callback backlog is full
+        
+        Args:
+            topic: The topic the message was received on
+        """
+        self._dropped_messages += 1
+        # Rate-limit the warning during message storms
+        if self._dropped_messages == 1 or self._dropped_messages % 100 == 0:
+            logger.warning("Inbox full, dropped %d message(s); latest on %s", self._dropped_messages, topic)
+    
+    def _parse_message(self, topic: str, raw_payload: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Parse a received payload
+        
+        Args:
+            topic: The topic the message was received on
+            raw_payload: The undecoded message payload
+            
+        Returns:
+            The parsed payload, or None if it could not be parsed
+        """
+        try:
+            # Parse straight from bytes; only decode to str for debug logging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Received message on %s: %s", topic, raw_payload.decode('utf-8', errors='replace'))
+            payload = loads(raw_payload)
+            
+            # Log the commandId only when debugging; most messages legitimately have none
+            if logger.isEnabledFor(logging.DEBUG):
+                command_id = payload.get('commandId')
+                if command_id:
+                    logger.debug("Command ID in received message: %s", command_id)
+                else:
+                    logger.debug("No commandId in received message: %s", LazyJson(payload))
+                    
+            return payload
+        except Exception as e:
+            logger.exception("Error processing message from %s: %s", topic, e)
+            return None
+    
+    async def _drain_inbox(self) -> None:
+        """
+        Parse and dispatch queued messages, running at most MAX_CONCURRENT_CALLBACKS callbacks at once
+        
+        The loop never waits for a callback slot: callbacks may themselves be
+        waiting for shadow responses that are still in the inbox.
+        """
+        while True:
+            # Take everything that is already queued in one go
+            batch = [await self._inbox.get()]
+            while not self._inbox.empty():
+                batch.append(self._inbox.get_nowait())
+                
+            for subscription, topic, raw_payload in batch:
+                payload = self._parse_message(topic, raw_payload)
+                if payload is None:
+                    continue
+                    
+                if self.subscriptions.get(subscription) == self._dispatch_shadow_response:
+                    # Only resolves a future, so it needs neither a task nor a slot
+                    self._resolve_shadow_response(topic, payload)
+                elif len(self._callback_tasks) < MAX_CONCURRENT_CALLBACKS:
+                    self._start_callback(subscription, topic, payload)
+                elif len(self._waiting_callbacks) < INBOX_MAX_SIZE:
+                    self._waiting_callbacks.append((subscription, topic, payload))
+                else:
+                    self._drop_message(topic)
+    
+    def _start_callback(self, subscription: str, topic: str, payload: Dict[str, Any]) -> None:
+        """
+        Run the callback for a message in its own task
+        
+        Args:
+            subscription: The subscribed topic filter the callback is registered for
+            topic: The topic the message was received on
+            payload: The message payload
+        """
+        task = asyncio.create_task(self._run_callback(subscription, topic, payload))
+        self._callback_tasks.add(task)
+        task.add_done_callback(self._on_callback_done)
+    
+    def _on_callback_done(self, task: asyncio.Task) -> None:
+        """Hand the slot of a finished callback task to the next waiting message"""
+        self._callback_tasks.discard(task)
+        if self._waiting_callbacks:
+            self._start_callback(*self._waiting_callbacks.popleft())
+        
+    async def _run_callback(self, subscription: str, topic: str, payload: Dict[str, Any]) -> None:
         """
         Run the callback function for a topic with error handling
         
         Args:
+            subscription: The subscribed topic filter the callback is registered for
             topic: The topic the message was received on
             payload: The message payload
         """
         try:
-            callback = self.subscriptions.get(topic)
+            callback = self.subscriptions.get(subscription)
             if callback:
                 await callback(topic, payload)
         except Exception as e:
-            logger.error(f"Error in callback for {topic}: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error in callback for %s: %s", topic, e)
         
     async def unsubscribe(self, topic: str) -> bool:
         """
@@ -166,7 +384,7 @@ class GreengrassSDKClient(MQTTInterface):
         Args:
             topic: Topic to unsubscribe from
         """
-        logger.info(f"Unsubscribing from {topic}")
+        logger.info("Unsubscribing from %s", topic)
         
         if topic in self.subscriptions:
             # Remove callback
@@ -174,15 +392,14 @@ class GreengrassSDKClient(MQTTInterface):
             
             try:
                 # Close the subscription operation
-                if topic in self.subscription_operations:
-                    self.subscription_operations[topic].close()
-                    del self.subscription_operations[topic]
+                operation = self.subscription_operations.pop(topic, None)
+                if operation:
+                    operation.close()
                     
-                logger.info(f"Successfully unsubscribed from {topic}")
+                logger.info("Successfully unsubscribed from %s", topic)
                 return True
             except Exception as e:
-                logger.error(f"Failed to unsubscribe from {topic}: {e}")
-                logger.error(traceback.format_exc())
+                logger.exception("Failed to unsubscribe from %s: %s", topic, e)
                 return False
                 
         return False
@@ -195,89 +412,231 @@ class GreengrassSDKClient(MQTTInterface):
             topic: Topic to publish to
             payload: Message payload
         """
+        # Serialize the payload directly to bytes
+        return await self.publish_raw(topic, dumps_bytes(payload))
+        
+    async def publish_raw(self, topic: str, payload: bytes) -> bool:
+        """
+        Publish a payload that is already serialized to JSON bytes
+        
+        Args:
+            topic: Topic to publish to
+            payload: JSON document as bytes
+        """
         if not self.connected:
             logger.error("Cannot publish, not connected")
             return False
             
-        logger.info(f"Publishing to {topic}")
+        logger.info("Publishing to %s", topic)
         
         try:
-            # Convert the payload to JSON string, then to bytes
-            payload_json = json.dumps(payload)
-            payload_bytes = payload_json.encode('utf-8')
-            
             # Publish to IoT Core topic using ClientV2 API
-            self.client.publish_to_iot_core(
+            # The call blocks on the IPC round-trip, so run it in a worker thread
+            await asyncio.to_thread(
+                self.client.publish_to_iot_core,
                 topic_name=topic,
                 qos=1,
-                payload=payload_bytes
+                payload=payload
             )
             
-            logger.info(f"Successfully published to {topic}")
+            logger.info("Successfully published to %s", topic)
+            return True
+        except Exception as e:
+            logger.exception("Failed to publish to %s: %s", topic, e)
+            return False
+    
+    async def publish_batch(self, messages: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """
+        Publish several messages concurrently
+        
+        Every request is sent, in order, before any acknowledgement is awaited,
+        so the IPC round-trips overlap instead of running one after another.
+        
+        Args:
+            messages: List of (topic, payload) tuples, published in order
+        """
+        if not self.connected:
+            logger.error("Cannot publish, not connected")
+            return False
+            
+        if not messages:
+            return True
+            
+        logger.info("Publishing %d messages to %s", len(messages), ", ".join(topic for topic, _ in messages))
+        
+        try:
+            futures = [
+                asyncio.wrap_future(self.client.publish_to_iot_core_async(
+                    topic_name=topic,
+                    qos=1,
+                    payload=dumps_bytes(payload)
+                ))
+                for topic, payload in messages
+            ]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                logger.error("Failed to publish %d of %d messages: %s", len(errors), len(messages), errors[0])
+                return False
+                
+            logger.info("Successfully published %d messages", len(messages))
             return True
         except Exception as e:
-            logger.error(f"Failed to publish to {topic}: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to publish batch: %s", e)
             return False
         
-    def _get_shadow_topic(self, thing_name: str, operation: str, shadow_name: Optional[str] = None) -> str:
+    @staticmethod
+    def _get_shadow_topic(thing_name: str, operation: str, shadow_name: Optional[str] = None) -> str:
         """
         Get the MQTT topic for shadow operations
         
         Args:
             thing_name: Name of the IoT thing
-            operation: Shadow operation (get, update, delete)
+            operation: Shadow operation (get, update, delete, update/delta)
             shadow_name: Name of the shadow (None for classic/unnamed shadow)
         """
         if shadow_name:
             return f"$aws/things/{thing_name}/shadow/name/{shadow_name}/{operation}"
         return f"$aws/things/{thing_name}/shadow/{operation}"
     
-    async def get_shadow(self, thing_name: str, shadow_name: Optional[str] = None) -> Dict[str, Any]:
-        """Get the current state of a device shadow"""
-        if not self.connected:
-            logger.error("Cannot get shadow, not connected")
-            return {}
+    @classmethod
+    @functools.lru_cache(maxsize=64)
+    def _shadow_topics(cls, thing_name: str, shadow_name: Optional[str] = None) -> ShadowTopics:
+        """
+        Get all operation topics of a shadow, built once per (thing_name, shadow_name)
+        
+        Args:
+            thing_name: Name of the IoT thing
+            shadow_name: Name of the shadow (None for classic/unnamed shadow)
+        """
+        return ShadowTopics(
+            get=cls._get_shadow_topic(thing_name, "get", shadow_name),
+            update=cls._get_shadow_topic(thing_name, "update", shadow_name),
+            delete=cls._get_shadow_topic(thing_name, "delete", shadow_name),
+            update_delta=cls._get_shadow_topic(thing_name, "update/delta", shadow_name)
+        )
+    
+    async def _subscribe_shadow_responses(self, thing_name: str) -> bool:
+        """
+        Subscribe once to the accepted/rejected shadow response topics of a thing
+        
+        Responses for both the classic and named shadows are routed to
+        _dispatch_shadow_response, which resolves the pending request by clientToken.
+        
+        Args:
+            thing_name: Name of the IoT thing
+        """
+        if thing_name in self._shadow_subscribed_things:
+            return True
+            
+        async with self._shadow_subscribe_lock:
+            # Another request may have subscribed while this one was waiting
+            if thing_name in self._shadow_subscribed_things:
+                return True
+                
+            topics = [
+                f"$aws/things/{thing_name}/shadow/+/accepted",
+                f"$aws/things/{thing_name}/shadow/+/rejected",
+                f"$aws/things/{thing_name}/shadow/name/+/+/accepted",
+                f"$aws/things/{thing_name}/shadow/name/+/+/rejected"
+            ]
             
-        logger.info(f"Getting shadow for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
+            # Issue all subscriptions concurrently rather than one round-trip at a time,
+            # skipping filters that are already active after an earlier partial failure
+            results = await asyncio.gather(
+                *(self.subscribe(topic, self._dispatch_shadow_response)
+                  for topic in topics if topic not in self.subscription_operations)
+            )
+            if not all(results):
+                return False
+                    
+            self._shadow_subscribed_things.add(thing_name)
+            return True
+    
+    async def _dispatch_shadow_response(self, topic: str, payload: Dict[str, Any]) -> None:
+        """
+        Subscription callback for shadow response topics
         
-        # Create a future to store the result
-        result_future = self.event_loop.create_future()
+        _drain_inbox resolves these responses inline instead of calling this.
         
-        # Create the callback function
-        async def shadow_response_callback(topic: str, payload: Dict[str, Any]) -> None:
-            # Check if this is an accepted or rejected response
-            if "/accepted" in topic and not result_future.done():
-                result_future.set_result(payload)
-            elif "/rejected" in topic and not result_future.done():
-                logger.error(f"Shadow get rejected: {json.dumps(payload)}")
-                result_future.set_exception(Exception(f"Shadow get rejected: {json.dumps(payload)}"))
+        Args:
+            topic: The topic the response was received on
+            payload: The response payload
+        """
+        self._resolve_shadow_response(topic, payload)
         
-        # Get topic names
-        get_topic = self._get_shadow_topic(thing_name, "get", shadow_name)
-        accepted_topic = f"{get_topic}/accepted"
-        rejected_topic = f"{get_topic}/rejected"
+    def _resolve_shadow_response(self, topic: str, payload: Dict[str, Any]) -> None:
+        """
+        Resolve the pending shadow request matching the clientToken of a response
         
-        # Subscribe to the response topics
-        await self.subscribe(accepted_topic, shadow_response_callback)
-        await self.subscribe(rejected_topic, shadow_response_callback)
+        Args:
+            topic: The topic the response was received on
+            payload: The response payload
+        """
+        token = payload.get('clientToken')
+        future = self._pending.get(token) if token else None
+        if future is None or future.done():
+            return
+            
+        # Route on the last topic level via a single dict lookup
+        resolve = _SHADOW_RESPONSE_HANDLERS.get(topic[topic.rfind('/') + 1:])
+        if resolve:
+            resolve(future, payload)
+    
+    async def _shadow_request(self, thing_name: str, operation: str,
+                              shadow_name: Optional[str] = None,
+                              document: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Publish a shadow request and wait for the matching accepted response
+        
+        Args:
+            thing_name: Name of the IoT thing
+            operation: Shadow operation (get, update, delete)
+            shadow_name: Name of the shadow (None for classic/unnamed shadow)
+            document: Request document to publish
+            
+        Returns:
+            The accepted response payload
+            
+        Raises:
+            asyncio.TimeoutError: If no response arrives in time
+            Exception: If the request is rejected or could not be published
+        """
+        await self._subscribe_shadow_responses(thing_name)
+        
+        token = uuid.uuid4().hex
+        result_future = self.event_loop.create_future()
+        self._pending[token] = result_future
         
         try:
-            # Publish empty message to get shadow
-            await self.publish(get_topic, {})
+            request = dict(document) if document else {}
+            request['clientToken'] = token
             
-            # Wait for the response with timeout
+            topic = getattr(self._shadow_topics(thing_name, shadow_name), operation)
+            if not await self.publish(topic, request):
+                raise Exception(f"Failed to publish shadow {operation} request")
+                
             return await asyncio.wait_for(result_future, timeout=5.0)
+        finally:
+            self._pending.pop(token, None)
+    
+    async def get_shadow(self, thing_name: str, shadow_name: Optional[str] = None) -> Dict[str, Any]:
+        """Get the current state of a device shadow"""
+        if not self.connected:
+            logger.error("Cannot get shadow, not connected")
+            return {}
+            
+        logger.info("Getting shadow for %s%s", thing_name, f"/{shadow_name}" if shadow_name else "")
+        
+        try:
+            return await self._shadow_request(thing_name, "get", shadow_name)
         except asyncio.TimeoutError:
-            logger.error(f"Timeout waiting for shadow response")
+            logger.error("Timeout waiting for shadow response")
             return {}
         except Exception as e:
-            logger.error(f"Error getting shadow: {e}")
+            logger.error("Error getting shadow: %s", e)
             return {}
-        finally:
-            # Unsubscribe from response topics
-            await self.unsubscribe(accepted_topic)
-            await self.unsubscribe(rejected_topic)
     
     async def update_shadow(self, thing_name: str, state: Dict[str, Any], shadow_name: Optional[str] = None) -> bool:
         """Update the state of a device shadow"""
@@ -285,46 +644,17 @@ class GreengrassSDKClient(MQTTInterface):
             logger.error("Cannot update shadow, not connected")
             return False
             
-        logger.info(f"Updating shadow for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
-        
-        # Create a future for the result
-        result_future = self.event_loop.create_future()
-        
-        # Create the callback function
-        async def shadow_response_callback(topic: str, payload: Dict[str, Any]) -> None:
-            # Check if this is an accepted or rejected response
-            if "/accepted" in topic and not result_future.done():
-                result_future.set_result(True)
-            elif "/rejected" in topic and not result_future.done():
-                logger.error(f"Shadow update rejected: {json.dumps(payload)}")
-                result_future.set_exception(Exception(f"Shadow update rejected: {json.dumps(payload)}"))
-        
-        # Get topic names
-        update_topic = self._get_shadow_topic(thing_name, "update", shadow_name)
-        accepted_topic = f"{update_topic}/accepted"
-        rejected_topic = f"{update_topic}/rejected"
-        
-        # Subscribe to the response topics
-        await self.subscribe(accepted_topic, shadow_response_callback)
-        await self.subscribe(rejected_topic, shadow_response_callback)
+        logger.info("Updating shadow for %s%s", thing_name, f"/{shadow_name}" if shadow_name else "")
         
         try:
-            # Publish update
-            shadow_document = {"state": state}
-            await self.publish(update_topic, shadow_document)
-            
-            # Wait for the response with timeout
-            return await asyncio.wait_for(result_future, timeout=5.0)
+            await self._shadow_request(thing_name, "update", shadow_name, {"state": state})
+            return True
         except asyncio.TimeoutError:
-            logger.error(f"Timeout waiting for shadow update response")
+            logger.error("Timeout waiting for shadow update response")
             return False
         except Exception as e:
-            logger.error(f"Error updating shadow: {e}")
+            logger.error("Error updating shadow: %s", e)
             return False
-        finally:
-            # Unsubscribe from response topics
-            await self.unsubscribe(accepted_topic)
-            await self.unsubscribe(rejected_topic)
     
     async def delete_shadow(self, thing_name: str, shadow_name: Optional[str] = None) -> bool:
         """Delete a device shadow"""
@@ -332,45 +662,17 @@ class GreengrassSDKClient(MQTTInterface):
             logger.error("Cannot delete shadow, not connected")
             return False
             
-        logger.info(f"Deleting shadow for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
-        
-        # Create a future for the result
-        result_future = self.event_loop.create_future()
-        
-        # Create the callback function
-        async def shadow_response_callback(topic: str, payload: Dict[str, Any]) -> None:
-            # Check if this is an accepted or rejected response
-            if "/accepted" in topic and not result_future.done():
-                result_future.set_result(True)
-            elif "/rejected" in topic and not result_future.done():
-                logger.error(f"Shadow delete rejected: {json.dumps(payload)}")
-                result_future.set_exception(Exception(f"Shadow delete rejected: {json.dumps(payload)}"))
-        
-        # Get topic names
-        delete_topic = self._get_shadow_topic(thing_name, "delete", shadow_name)
-        accepted_topic = f"{delete_topic}/accepted"
-        rejected_topic = f"{delete_topic}/rejected"
-        
-        # Subscribe to the response topics
-        await self.subscribe(accepted_topic, shadow_response_callback)
-        await self.subscribe(rejected_topic, shadow_response_callback)
+        logger.info("Deleting shadow for %s%s", thing_name, f"/{shadow_name}" if shadow_name else "")
         
         try:
-            # Publish delete request
-            await self.publish(delete_topic, {})
-            
-            # Wait for the response with timeout
-            return await asyncio.wait_for(result_future, timeout=5.0)
+            await self._shadow_request(thing_name, "delete", shadow_name)
+            return True
         except asyncio.TimeoutError:
-            logger.error(f"Timeout waiting for shadow delete response")
+            logger.error("Timeout waiting for shadow delete response")
             return False
         except Exception as e:
-            logger.error(f"Error deleting shadow: {e}")
+            logger.error("Error deleting shadow: %s", e)
             return False
-        finally:
-            # Unsubscribe from response topics
-            await self.unsubscribe(accepted_topic)
-            await self.unsubscribe(rejected_topic)
     
     async def register_shadow_delta_callback(self, thing_name: str, 
                                            callback: Callable[[Dict[str, Any]], Awaitable[None]],
@@ -380,21 +682,17 @@ class GreengrassSDKClient(MQTTInterface):
             logger.error("Cannot register shadow delta callback, not connected")
             return False
             
-        logger.info(f"Registering shadow delta callback for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
+        logger.info("Registering shadow delta callback for %s%s", thing_name, f"/{shadow_name}" if shadow_name else "")
         
         # Create a wrapper callback that extracts the payload
         async def delta_wrapper(topic: str, payload: Dict[str, Any]) -> None:
             try:
                 await callback(payload)
             except Exception as e:
-                logger.error(f"Error in shadow delta callback: {e}")
-                logger.error(traceback.format_exc())
+                logger.exception("Error in shadow delta callback: %s", e)
         
         # Subscribe to the delta topic
-        if shadow_name:
-            delta_topic = f"$aws/things/{thing_name}/shadow/name/{shadow_name}/update/delta"
-        else:
-            delta_topic = f"$aws/things/{thing_name}/shadow/update/delta"
+        delta_topic = self._shadow_topics(thing_name, shadow_name).update_delta
             
         return await self.subscribe(delta_topic, delta_wrapper)
     
@@ -404,12 +702,9 @@ class GreengrassSDKClient(MQTTInterface):
             logger.error("Cannot unregister shadow delta callback, not connected")
             return False
             
-        logger.info(f"Unregistering shadow delta callback for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
+        logger.info("Unregistering shadow delta callback for %s%s", thing_name, f"/{shadow_name}" if shadow_name else "")
         
         # Unsubscribe from the delta topic
-        if shadow_name:
-            delta_topic = f"$aws/things/{thing_name}/shadow/name/{shadow_name}/update/delta"
-        else:
-            delta_topic = f"$aws/things/{thing_name}/shadow/update/delta"
+        delta_topic = self._shadow_topics(thing_name, shadow_name).update_delta
             
         return await self.unsubscribe(delta_topic)
\ No newline at end of file
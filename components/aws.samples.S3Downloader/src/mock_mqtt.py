@@ -1,26 +1,127 @@
 import asyncio
-import json
+import collections
+import functools
 import time
-from typing import Dict, Any, Callable, Awaitable, List, Optional
+from typing import Dict, Any, Callable, Awaitable, Iterator, Optional, Set
 
 from .utils.logging_config import get_logger
+from .utils.json_utils import LazyJson
 from .mqtt_interface import MQTTInterface
 
 logger = get_logger(__name__)
 
+# Sentinel for keys missing from the reported state
+_MISSING = object()
+
+
+class TopicMatcher:
+    """
+    Trie of MQTT topic filters containing '+' or '#' wildcards
+    
+    Matching walks one trie level per topic level, so its cost depends on the
+    topic depth rather than on the number of subscribed filters.
+    """
+    __slots__ = ('children', 'filters')
+    
+    def __init__(self):
+        self.children: Dict[str, 'TopicMatcher'] = {}
+        # Filters ending at this node
+        self.filters: Set[str] = set()
+        
+    def __bool__(self) -> bool:
+        return bool(self.children)
+        
+    def add(self, topic_filter: str) -> None:
+        """Add a topic filter"""
+        node = self
+        for level in topic_filter.split('/'):
+            node = node.children.setdefault(level, TopicMatcher())
+        node.filters.add(topic_filter)
+        
+    def remove(self, topic_filter: str) -> None:
+        """Remove a topic filter, pruning nodes left empty"""
+        path = [self]
+        levels = topic_filter.split('/')
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].filters.discard(topic_filter)
+        
+        for level, parent, node in zip(reversed(levels), reversed(path[:-1]), reversed(path)):
+            if node.filters or node.children:
+                break
+            del parent.children[level]
+            
+    def match(self, topic: str) -> Iterator[str]:
+        """
+        Yield every stored filter that matches a topic
+        
+        Args:
+            topic: Concrete topic name
+        """
+        levels = topic.split('/')
+        nodes = [self]
+        # Wildcards in the first level never match topics reserved with '$'
+        skip_wildcards = topic.startswith('$')
+        for level in levels:
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                if not skip_wildcards:
+                    multi = children.get('#')
+                    if multi is not None:
+                        yield from multi.filters
+                    single = children.get('+')
+                    if single is not None:
+                        next_nodes.append(single)
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+            if not next_nodes:
+                return
+            nodes = next_nodes
+            skip_wildcards = False
+            
+        for node in nodes:
+            yield from node.filters
+            # 'a/#' also matches 'a'
+            multi = node.children.get('#')
+            if multi is not None:
+                yield from multi.filters
+
+
 
 class MockMQTTClient(MQTTInterface):
     """
     Mock implementation of the MQTT interface for local testing
     """
+    __slots__ = (
+        'subscriptions', '_wildcard_filters', 'connected', 'command_queue',
+        '_responses', '_response_event', 'shadows', 'shadow_delta_callbacks',
+        '_delta_callback_keys'
+    )
     
-    def __init__(self):
-        self.subscriptions: Dict[str, List[Callable]] = {}
+    def __init__(self, queue_size: int = 1024):
+        """
+        Initialize the mock client
+        
+        Args:
+            queue_size: Maximum number of queued commands and published responses
+        """
+        self.subscriptions: Dict[str, Set[Callable]] = {}
+        # Index of the subscribed filters that contain wildcards
+        self._wildcard_filters = TopicMatcher()
         self.connected = False
-        self.command_queue = asyncio.Queue()
-        self.response_queue = asyncio.Queue()
+        self.command_queue = asyncio.Queue(maxsize=queue_size)
+        # Published responses; the oldest is dropped once queue_size is reached
+        self._responses = collections.deque(maxlen=queue_size)
+        self._response_event = asyncio.Event()
         self.shadows: Dict[str, Dict[str, Any]] = {}
         self.shadow_delta_callbacks: Dict[str, Callable] = {}
+        # Reverse index of the shadow keys each delta callback is registered for
+        self._delta_callback_keys: Dict[Callable, Set[str]] = {}
         
     async def connect(self) -> bool:
         """Connect to the mock MQTT broker"""
@@ -36,42 +137,93 @@ class MockMQTTClient(MQTTInterface):
         
     async def subscribe(self, topic: str, callback: Callable[[str, Dict[str, Any]], Awaitable[None]]) -> bool:
         """Subscribe to a topic"""
-        if topic not in self.subscriptions:
-            self.subscriptions[topic] = []
-        
-        self.subscriptions[topic].append(callback)
+        callbacks = self.subscriptions.get(topic)
+        if callbacks is None:
+            callbacks = self.subscriptions[topic] = set()
+            if '+' in topic or '#' in topic:
+                self._wildcard_filters.add(topic)
+        callbacks.add(callback)
         logger.info(f"Mock MQTT: Subscribed to {topic}")
         return True
         
     async def unsubscribe(self, topic: str) -> bool:
         """Unsubscribe from a topic"""
         if topic in self.subscriptions:
-            del self.subscriptions[topic]
+            self._remove_subscription(topic)
             logger.info(f"Mock MQTT: Unsubscribed from {topic}")
             return True
         return False
         
+    async def unsubscribe_callback(self, topic: str, callback: Callable) -> bool:
+        """Remove a single callback from a topic, keeping any other subscribers"""
+        callbacks = self.subscriptions.get(topic)
+        if not callbacks or callback not in callbacks:
+            return False
+            
+        callbacks.discard(callback)
+        if not callbacks:
+            self._remove_subscription(topic)
+        logger.info(f"Mock MQTT: Removed callback from {topic}")
+        return True
+        
+    def _remove_subscription(self, topic: str) -> None:
+        """Drop a topic filter and all its callbacks"""
+        del self.subscriptions[topic]
+        if '+' in topic or '#' in topic:
+            self._wildcard_filters.remove(topic)
+        
     async def publish(self, topic: str, payload: Dict[str, Any]) -> bool:
         """Publish a message to a topic"""
         if not self.connected:
             logger.error("Mock MQTT: Cannot publish, not connected")
             return False
             
-        logger.info(f"Mock MQTT: Publishing to {topic}: {json.dumps(payload)}")
+        logger.info("Mock MQTT: Publishing to %s: %s", topic, LazyJson(payload))
         
-        # Put the message in the response queue for interactive testing
-        await self.response_queue.put((topic, payload))
+        # Keep the message for interactive testing, dropping the oldest
+        # response if nobody is consuming them
+        self._responses.append((topic, payload))
+        self._response_event.set()
         
         # Deliver to subscribers if any
-        if topic in self.subscriptions:
-            for callback in self.subscriptions[topic]:
-                try:
-                    await callback(topic, payload)
-                except Exception as e:
-                    logger.error(f"Error in subscriber callback: {e}")
+        await self._deliver(topic, payload)
         
         return True
         
+    async def _deliver(self, topic: str, payload: Dict[str, Any]) -> bool:
+        """
+        Run all subscriber callbacks for a topic concurrently
+        
+        Args:
+            topic: Topic the message was published to
+            payload: Message payload
+            
+        Returns:
+            True if the topic had any subscribers
+        """
+        callbacks = self.subscriptions.get(topic)
+        if self._wildcard_filters:
+            matched = [self.subscriptions[topic_filter] for topic_filter in self._wildcard_filters.match(topic)]
+            if matched:
+                callbacks = set(callbacks) if callbacks else set()
+                callbacks.update(*matched)
+        if not callbacks:
+            return False
+            
+        # Snapshot so callbacks can (un)subscribe while being delivered to
+        callbacks = tuple(callbacks)
+            
+        results = await asyncio.gather(
+            *(callback(topic, payload) for callback in callbacks),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Error in subscriber callback: %s", result, exc_info=result)
+            else:
+                logger.info("Callback executed successfully")
+        return True
+        
     async def inject_message(self, topic: str, payload: Dict[str, Any]) -> None:
         """
         Inject a message as if it came from the broker
@@ -80,16 +232,9 @@ class MockMQTTClient(MQTTInterface):
             topic: Topic to publish to
             payload: Message payload
         """
-        logger.info(f"Injecting message to {topic}: {json.dumps(payload)}")
+        logger.info("Injecting message to %s: %s", topic, LazyJson(payload))
         
-        if topic in self.subscriptions:
-            for callback in self.subscriptions[topic]:
-                try:
-                    await callback(topic, payload)
-                    logger.info("Callback executed successfully")
-                except Exception as e:
-                    logger.error(f"Error in subscriber callback: {e}")
-        else:
+        if not await self._deliver(topic, payload):
             logger.warning(f"No subscribers found for topic {topic}")
         
     async def get_next_response(self) -> tuple:
@@ -99,7 +244,10 @@ class MockMQTTClient(MQTTInterface):
         Returns:
             Tuple of (topic, payload)
         """
-        return await self.response_queue.get()
+        while not self._responses:
+            self._response_event.clear()
+            await self._response_event.wait()
+        return self._responses.popleft()
         
     async def wait_for_command(self) -> Dict[str, Any]:
         """
@@ -119,16 +267,21 @@ class MockMQTTClient(MQTTInterface):
         """
         await self.command_queue.put(command)
 
-    def _get_shadow_key(self, thing_name: str, shadow_name: Optional[str] = None) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _get_shadow_key(thing_name: str, shadow_name: Optional[str] = None) -> str:
         """Get a key for shadow storage based on thing name and shadow name"""
+        # Cached so repeated lookups for the same device share one key string
         if shadow_name:
             return f"{thing_name}:{shadow_name}"
         return thing_name
     
-    def _initialize_shadow(self, shadow_key: str) -> None:
-        """Initialize a shadow if it doesn't exist"""
-        if shadow_key not in self.shadows:
-            self.shadows[shadow_key] = {
+    def _initialize_shadow(self, shadow_key: str, timestamp: Optional[int] = None) -> Dict[str, Any]:
+        """Initialize a shadow if it doesn't exist and return it"""
+        shadow = self.shadows.get(shadow_key)
+        if shadow is None:
+            # A literal is cheaper to build than copying a template
+            shadow = self.shadows[shadow_key] = {
                 "state": {
                     "reported": {},
                     "desired": {}
@@ -138,67 +291,73 @@ class MockMQTTClient(MQTTInterface):
                     "desired": {}
                 },
                 "version": 1,
-                "timestamp": int(time.time())
+                "timestamp": int(time.time()) if timestamp is None else timestamp
             }
+        return shadow
+    
+    def _merge_state(self, target: Dict[str, Any], changes: Dict[str, Any]) -> None:
+        """Merge a state update into a shadow section like AWS IoT does: objects merge, null deletes"""
+        for key, value in changes.items():
+            if value is None:
+                target.pop(key, None)
+            elif isinstance(value, dict) and isinstance(target.get(key), dict):
+                self._merge_state(target[key], value)
+            else:
+                target[key] = value
     
     async def get_shadow(self, thing_name: str, shadow_name: Optional[str] = None) -> Dict[str, Any]:
         """Get the current state of a device shadow"""
-        logger.info(f"Mock MQTT: Getting shadow for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
-        
         shadow_key = self._get_shadow_key(thing_name, shadow_name)
-        self._initialize_shadow(shadow_key)
+        logger.info("Mock MQTT: Getting shadow for %s", shadow_key)
         
-        return self.shadows[shadow_key]
+        return self._initialize_shadow(shadow_key)
     
     async def update_shadow(self, thing_name: str, state: Dict[str, Any], shadow_name: Optional[str] = None) -> bool:
         """Update the state of a device shadow"""
-        logger.info(f"Mock MQTT: Updating shadow for {thing_name}{f'/{shadow_name}' if shadow_name else ''}: {json.dumps(state)}")
-        
         shadow_key = self._get_shadow_key(thing_name, shadow_name)
-        self._initialize_shadow(shadow_key)
+        logger.info("Mock MQTT: Updating shadow for %s: %s", shadow_key, LazyJson(state))
         
-        shadow = self.shadows[shadow_key]
+        now = int(time.time())
+        shadow = self._initialize_shadow(shadow_key, now)
         
         # Update version and timestamp
         shadow["version"] += 1
-        shadow["timestamp"] = int(time.time())
+        shadow["timestamp"] = now
         
         # Update state
         if "reported" in state:
-            shadow["state"]["reported"].update(state["reported"])
+            self._merge_state(shadow["state"]["reported"], state["reported"])
         if "desired" in state:
-            shadow["state"]["desired"].update(state["desired"])
-            
-            # Check for deltas between reported and desired
-            delta = {}
-            for key, value in shadow["state"]["desired"].items():
-                if key not in shadow["state"]["reported"] or shadow["state"]["reported"][key] != value:
-                    delta[key] = value
+            desired = shadow["state"]["desired"]
+            self._merge_state(desired, state["desired"])
             
-            # Trigger delta callback if there are differences
-            if delta and shadow_key in self.shadow_delta_callbacks:
-                delta_payload = {
-                    "state": delta,
-                    "metadata": {
-                        # Simplified metadata
-                        key: {"timestamp": shadow["timestamp"]} for key in delta
-                    },
-                    "version": shadow["version"],
-                    "timestamp": shadow["timestamp"]
-                }
+            # Only compute deltas when someone is listening for them
+            delta_callback = self.shadow_delta_callbacks.get(shadow_key)
+            if delta_callback and desired:
+                reported = shadow["state"]["reported"]
+                delta = {key: value for key, value in desired.items() if reported.get(key, _MISSING) != value}
                 
-                try:
-                    await self.shadow_delta_callbacks[shadow_key](delta_payload)
-                except Exception as e:
-                    logger.error(f"Error in shadow delta callback: {e}")
+                # Trigger delta callback if there are differences
+                if delta:
+                    delta_payload = {
+                        "state": delta,
+                        # Simplified metadata, one shared timestamp entry for every key
+                        "metadata": dict.fromkeys(delta, {"timestamp": shadow["timestamp"]}),
+                        "version": shadow["version"],
+                        "timestamp": shadow["timestamp"]
+                    }
+                    
+                    try:
+                        await delta_callback(delta_payload)
+                    except Exception as e:
+                        logger.exception("Error in shadow delta callback: %s", e)
         
         return True
     
     async def delete_shadow(self, thing_name: str, shadow_name: Optional[str] = None) -> bool:
         """Delete a device shadow"""
-        logger.info(f"Mock MQTT: Deleting shadow for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
-        
         shadow_key = self._get_shadow_key(thing_name, shadow_name)
+        logger.info("Mock MQTT: Deleting shadow for %s", shadow_key)
         
         if shadow_key in self.shadows:
             del self.shadows[shadow_key]
@@ -210,21 +369,49 @@ class MockMQTTClient(MQTTInterface):
                                             callback: Callable[[Dict[str, Any]], Awaitable[None]],
                                             shadow_name: Optional[str] = None) -> bool:
         """Register a callback for shadow delta updates"""
-        logger.info(f"Mock MQTT: Registering shadow delta callback for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
-        
         shadow_key = self._get_shadow_key(thing_name, shadow_name)
+        logger.info("Mock MQTT: Registering shadow delta callback for %s", shadow_key)
+        
+        previous = self.shadow_delta_callbacks.get(shadow_key)
+        if previous is not None:
+            self._discard_delta_callback_key(previous, shadow_key)
         self.shadow_delta_callbacks[shadow_key] = callback
+        self._delta_callback_keys.setdefault(callback, set()).add(shadow_key)
         
         return True
     
     async def unregister_shadow_delta_callback(self, thing_name: str, shadow_name: Optional[str] = None) -> bool:
         """Unregister the callback for shadow delta updates"""
-        logger.info(f"Mock MQTT: Unregistering shadow delta callback for {thing_name}{f'/{shadow_name}' if shadow_name else ''}")
-        
         shadow_key = self._get_shadow_key(thing_name, shadow_name)
+        logger.info("Mock MQTT: Unregistering shadow delta callback for %s", shadow_key)
         
-        if shadow_key in self.shadow_delta_callbacks:
-            del self.shadow_delta_callbacks[shadow_key]
+        callback = self.shadow_delta_callbacks.pop(shadow_key, None)
+        if callback is not None:
+            self._discard_delta_callback_key(callback, shadow_key)
             return True
         
-        return False
\ No newline at end of file
+        return False
+    
+    async def unregister_shadow_delta_callbacks_for(self, callback: Callable) -> int:
+        """
+        Unregister a callback from every shadow it was registered for
+        
+        Args:
+            callback: Previously registered delta callback
+            
+        Returns:
+            Number of shadows the callback was removed from
+        """
+        shadow_keys = self._delta_callback_keys.pop(callback, ())
+        for shadow_key in shadow_keys:
+            del self.shadow_delta_callbacks[shadow_key]
+        logger.info("Mock MQTT: Unregistered shadow delta callback from %d shadows", len(shadow_keys))
+        return len(shadow_keys)
+    
+    def _discard_delta_callback_key(self, callback: Callable, shadow_key: str) -> None:
+        """Remove a shadow key from a callback's reverse index entry"""
+        shadow_keys = self._delta_callback_keys.get(callback)
+        if shadow_keys is not None:
+            shadow_keys.discard(shadow_key)
+            if not shadow_keys:
+                del self._delta_callback_keys[callback]
\ No newline at end of file
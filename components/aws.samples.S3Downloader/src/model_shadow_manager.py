@@ -1,19 +1,90 @@
 import asyncio
-import json
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
 import os
 import uuid
 
 from .utils.logging_config import get_logger
+from .utils.json_utils import LazyJson
 from .mqtt_interface import MQTTInterface
 
 logger = get_logger(__name__)
 
+# Window in seconds during which model changes are coalesced into one shadow update
+SHADOW_UPDATE_WINDOW = 0.025
+# Number of coalesced changes that forces an update before the window ends
+SHADOW_UPDATE_MAX_BATCH = 100
+
+# Sentinel for fields missing from a record
+_MISSING = object()
+
+
+class ModelRecord:
+    """
+    Metadata for a single model
+    
+    Well-known fields are kept in slots; any other fields go to ``extra``.
+    Fields that were never set are omitted when converted back to a dict.
+    """
+    __slots__ = ('model_id', 'local_path', 'model_name', 'model_version', 'last_updated', 'extra')
+    
+    FIELDS = __slots__[:-1]
+    
+    def __init__(self, model_data: Dict[str, Any]):
+        self.model_id = None
+        self.local_path = None
+        self.model_name = None
+        self.model_version = None
+        self.last_updated = None
+        self.extra: Optional[Dict[str, Any]] = None
+        self.update(model_data)
+        
+    def update(self, model_data: Dict[str, Any]) -> bool:
+        """
+        Merge fields from a metadata dict into this record
+        
+        Args:
+            model_data: Model metadata
+            
+        Returns:
+            True if any field changed
+        """
+        changed = False
+        for key, value in model_data.items():
+            if key in self.FIELDS:
+                if getattr(self, key) != value:
+                    setattr(self, key, value)
+                    changed = True
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                if self.extra.get(key, _MISSING) != value:
+                    self.extra[key] = value
+                    changed = True
+        return changed
+                
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record to a metadata dict
+        
+        Returns:
+            Model metadata
+        """
+        data = {key: value for key in self.FIELDS if (value := getattr(self, key)) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
 class ModelShadowManager:
     """
     Manages model metadata using AWS IoT Device Shadows with simplified metadata tracking
     """
+    __slots__ = (
+        'mqtt_client', 'device_id', 'shadow_name', 'models_cache', '_dirty_ids', '_deleted_ids',
+        'initialized', '_update_future', '_update_task', '_update_requests', '_batch_full'
+    )
+    
     def __init__(self, mqtt_client: MQTTInterface, device_id: str):
         """
         Initialize the ModelShadowManager
@@ -26,12 +97,22 @@ class ModelShadowManager:
         self.device_id = device_id
         self.shadow_name = "models"  # Using a named shadow for all models
         
-        # Local cache of model metadata
-        self.models_cache: Dict[str, Dict[str, Any]] = {}
+        # Local cache of model metadata, converted to dicts only when reported or returned
+        self.models_cache: Dict[str, ModelRecord] = {}
+        
+        # Models changed or deleted since the last reported shadow update
+        self._dirty_ids: Set[str] = set()
+        self._deleted_ids: Set[str] = set()
         
         # Flag to track if we've initialized from shadow
         self.initialized = False
         
+        # Coalescing of shadow updates requested in quick succession
+        self._update_future: Optional[asyncio.Future] = None
+        self._update_task: Optional[asyncio.Task] = None
+        self._update_requests = 0
+        self._batch_full = asyncio.Event()
+        
     async def initialize(self) -> bool:
         """
         Initialize by retrieving current shadow state
@@ -47,28 +128,36 @@ class ModelShadowManager:
             
             if shadow_doc and 'state' in shadow_doc and 'reported' in shadow_doc['state']:
                 # Extract models from the shadow document
-                reported_models = shadow_doc['state']['reported'].get('models', {})
-                self.models_cache = reported_models
+                reported_models = shadow_doc['state']['reported'].get('models') or {}
+                self.models_cache = {
+                    model_id: ModelRecord(model_data)
+                    for model_id, model_data in reported_models.items()
+                    if model_data is not None
+                }
                 logger.info(f"Loaded {len(reported_models)} models from device shadow")
+                create_shadow = False
             else:
                 # Initialize empty shadow if it doesn't exist
                 logger.info("No existing model shadow found, initializing empty shadow")
-                await self.update_shadow()
+                create_shadow = True
                 
-            # Register for shadow delta callbacks
-            await self.mqtt_client.register_shadow_delta_callback(
-                self.device_id, 
-                self._handle_shadow_delta,
-                self.shadow_name
-            )
+            # Register for shadow delta callbacks, concurrently with the initial write
+            steps = [
+                self.mqtt_client.register_shadow_delta_callback(
+                    self.device_id, 
+                    self._handle_shadow_delta,
+                    self.shadow_name
+                )
+            ]
+            if create_shadow:
+                steps.append(self.update_shadow(full=True))
+            await asyncio.gather(*steps)
             
             self.initialized = True
             return True
             
         except Exception as e:
-            logger.error(f"Error initializing ModelShadowManager: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception("Error initializing ModelShadowManager: %s", e)
             return False
             
     async def _handle_shadow_delta(self, delta_payload: Dict[str, Any]) -> None:
@@ -78,7 +167,7 @@ class ModelShadowManager:
         Args:
             delta_payload: Delta payload from AWS IoT
         """
-        logger.info(f"Received shadow delta: {json.dumps(delta_payload)}")
+        logger.info("Received shadow delta: %s", LazyJson(delta_payload))
         
         if 'state' not in delta_payload:
             logger.warning("No state found in delta payload")
@@ -89,37 +178,126 @@ class ModelShadowManager:
         if not delta_models:
             return
             
-        # Update our local cache with the delta changes
+        # Update our local cache with the delta changes. Models that are not dirty are
+        # already in the reported state, so entries matching them are stale and skipped.
         for model_id, model_data in delta_models.items():
             if model_data is None:
                 # Remove model if the delta contains null
                 if model_id in self.models_cache:
                     logger.info(f"Removing model {model_id} based on delta")
                     del self.models_cache[model_id]
+                    self._mark_deleted(model_id)
             else:
                 # Update or add model
-                if model_id in self.models_cache:
-                    self.models_cache[model_id].update(model_data)
+                record = self.models_cache.get(model_id)
+                if record is None:
+                    self.models_cache[model_id] = ModelRecord(model_data)
+                    logger.info(f"Added new model {model_id} based on delta")
+                elif record.update(model_data):
                     logger.info(f"Updated model {model_id} based on delta")
                 else:
-                    self.models_cache[model_id] = model_data
-                    logger.info(f"Added new model {model_id} based on delta")
+                    continue
+                self._mark_changed(model_id)
                     
-        # Report our updated state back to the shadow
-        await self.update_shadow()
+        # Report our updated state back to the shadow unless it is already consistent
+        if self._dirty_ids or self._deleted_ids:
+            await self._request_shadow_update()
         
-    async def update_shadow(self) -> bool:
+    def _mark_changed(self, model_id: str) -> None:
+        """Record that a model must be included in the next reported update"""
+        self._deleted_ids.discard(model_id)
+        self._dirty_ids.add(model_id)
+        
+    def _mark_deleted(self, model_id: str) -> None:
+        """Record that a model must be removed from the reported state in the next update"""
+        self._dirty_ids.discard(model_id)
+        self._deleted_ids.add(model_id)
+        
+    async def _request_shadow_update(self) -> bool:
+        """
+        Request a shadow update, coalescing requests made within SHADOW_UPDATE_WINDOW
+        
+        All callers that join the same window share a single update_shadow() call.
+        
+        Returns:
+            Success status of the shared update
+        """
+        if self._update_future is None:
+            self._update_future = asyncio.get_running_loop().create_future()
+            self._update_task = asyncio.create_task(self._flush_after_window())
+            
+        future = self._update_future
+        self._update_requests += 1
+        if self._update_requests >= SHADOW_UPDATE_MAX_BATCH:
+            self._batch_full.set()
+            
+        return await asyncio.shield(future)
+        
+    async def _flush_after_window(self) -> None:
+        """Wait for the coalescing window (or a full batch), then publish one shadow update"""
+        future = self._update_future
+        result = False
+        try:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=SHADOW_UPDATE_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+                
+            # Later requests start a new window
+            self._update_future = None
+            self._update_requests = 0
+            self._batch_full.clear()
+            
+            result = await self.update_shadow()
+        finally:
+            if self._update_future is future:
+                self._update_future = None
+            if not future.done():
+                future.set_result(result)
+                
+    async def flush(self) -> bool:
+        """
+        Wait for any pending coalesced update, or publish outstanding changes immediately
+        
+        Returns:
+            Success status
+        """
+        if self._update_future is not None:
+            return await asyncio.shield(self._update_future)
+        return await self.update_shadow()
+        
+    async def update_shadow(self, full: bool = False) -> bool:
         """
-        Update the device shadow with current model metadata
+        Update the device shadow with model metadata
+        
+        By default only models changed since the last update are reported, relying on
+        the shadow merging reported state (a null value removes a model).
         
+        Args:
+            full: Report the whole models cache instead of only the changes
+            
         Returns:
             Success status
         """
+        # Take ownership of the pending changes; they are restored if the update fails
+        dirty_ids, deleted_ids = self._dirty_ids, self._deleted_ids
+        self._dirty_ids, self._deleted_ids = set(), set()
+        
+        if full:
+            models = dict.fromkeys(deleted_ids)
+            models.update((model_id, record.to_dict()) for model_id, record in self.models_cache.items())
+        elif dirty_ids or deleted_ids:
+            models = dict.fromkeys(deleted_ids)
+            models.update((model_id, self.models_cache[model_id].to_dict()) for model_id in dirty_ids)
+        else:
+            return True
+            
+        result = False
         try:
             # Prepare shadow state document
             state = {
                 "reported": {
-                    "models": self.models_cache
+                    "models": models
                 }
             }
             
@@ -132,10 +310,15 @@ class ModelShadowManager:
             
             return result
         except Exception as e:
-            logger.error(f"Error updating model shadow: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception("Error updating model shadow: %s", e)
             return False
+        finally:
+            if not result:
+                # Keep the unreported changes for the next update unless they were superseded
+                self._deleted_ids.update(deleted_ids - self._dirty_ids)
+                self._dirty_ids.update(
+                    model_id for model_id in dirty_ids - self._deleted_ids if model_id in self.models_cache
+                )
             
     async def add_or_update_model(self, model_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -172,18 +355,27 @@ class ModelShadowManager:
             
         model_id = model_data['model_id']
         
-        # Add timestamp metadata if not provided
-        if 'last_updated' not in model_data:
-            model_data['last_updated'] = time.time()
-            
         # Update our local cache
-        if model_id in self.models_cache:
-            self.models_cache[model_id].update(model_data)
+        record = self.models_cache.get(model_id)
+        if record is None:
+            record = self.models_cache[model_id] = ModelRecord(model_data)
+            changed = True
         else:
-            self.models_cache[model_id] = model_data
+            changed = record.update(model_data)
+            
+        if changed:
+            # Add timestamp metadata if not provided; only after comparing, so an
+            # identical request does not count as a change
+            if 'last_updated' not in model_data:
+                record.last_updated = time.time()
+            self._mark_changed(model_id)
             
-        # Update the shadow
-        success = await self.update_shadow()
+        if model_id in self._dirty_ids:
+            # Update the shadow, sharing the publish with other changes made in the same window
+            success = await self._request_shadow_update()
+        else:
+            # Unchanged and already reported
+            success = True
         
         if not success:
             return {
@@ -195,7 +387,7 @@ class ModelShadowManager:
         return {
             'success': True,
             'model_id': model_id,
-            'model': self.models_cache[model_id]
+            'model': self.models_cache[model_id].to_dict()
         }
         
     async def get_model(self, model_id: str) -> Dict[str, Any]:
@@ -223,7 +415,7 @@ class ModelShadowManager:
         return {
             'success': True,
             'model_id': model_id,
-            'model': self.models_cache[model_id]
+            'model': self.models_cache[model_id].to_dict()
         }
         
     async def get_all_models(self) -> Dict[str, Any]:
@@ -241,7 +433,7 @@ class ModelShadowManager:
                 
         return {
             'success': True,
-            'models': self.models_cache
+            'models': {model_id: record.to_dict() for model_id, record in self.models_cache.items()}
         }
         
     async def delete_model(self, model_id: str) -> Dict[str, Any]:
@@ -268,9 +460,10 @@ class ModelShadowManager:
             
         # Remove from local cache
         del self.models_cache[model_id]
+        self._mark_deleted(model_id)
         
-        # Update the shadow
-        success = await self.update_shadow()
+        # Update the shadow, sharing the publish with other changes made in the same window
+        success = await self._request_shadow_update()
         
         if not success:
             return {
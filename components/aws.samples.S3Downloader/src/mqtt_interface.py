@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Callable, Awaitable, Optional
+from typing import Dict, Any, Callable, Awaitable, List, Optional, Tuple
+
+from .utils.json_utils import loads
 
 class MQTTInterface(ABC):
     """
     Abstract interface for MQTT communication to ensure compatibility
     between mock implementation and actual AWS IoT Greengrass SDK.
     """
+    # No instance state here, so implementations may define __slots__
+    __slots__ = ()
     
     @abstractmethod
     async def connect(self) -> bool:
@@ -68,6 +72,41 @@ class MQTTInterface(ABC):
         """
         pass
         
+    async def publish_raw(self, topic: str, payload: bytes) -> bool:
+        """
+        Publish a payload that is already serialized to JSON bytes
+        
+        Implementations that send bytes over the wire should override this to
+        skip serialization. The default parses the payload and calls publish().
+        
+        Args:
+            topic: Topic to publish to
+            payload: JSON document as bytes
+            
+        Returns:
+            Success status
+        """
+        return await self.publish(topic, loads(payload))
+        
+    async def publish_batch(self, messages: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """
+        Publish several messages in order
+        
+        Implementations may override this to amortize per-message transport cost.
+        The default publishes each message in turn.
+        
+        Args:
+            messages: List of (topic, payload) tuples
+            
+        Returns:
+            Success status (False if any message failed)
+        """
+        success = True
+        for topic, payload in messages:
+            if not await self.publish(topic, payload):
+                success = False
+        return success
+        
     @abstractmethod
     async def get_shadow(self, thing_name: str, shadow_name: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -1,16 +1,192 @@
 import asyncio
-import json
+import heapq
+import logging
 import re
 import os
+import shutil
+import secrets
 import uuid
 import time
-from typing import Dict, Any, Optional, List
+import traceback
+from collections import OrderedDict, defaultdict, deque
+from itertools import chain
+from typing import Dict, Any, Awaitable, Iterator, Optional, List, Set, Tuple
 
 from .utils.logging_config import get_logger
+from .utils.json_utils import LazyJson
 from .s5cmd_async import AsyncS5CommandController
 
 logger = get_logger(__name__)
 
+# Progress percentage as printed by s5cmd --show-progress
+_PROGRESS_RE = re.compile(r'(\d+\.\d+)%')
+# Characters of a progress percentage, scanned backwards from its '%'
+_PERCENT_CHARS = frozenset('0123456789.')
+# stderr message s5cmd prints when the destination runs out of space
+_NO_SPACE = "no space left on device"
+# Seconds a disk space reading is reused before querying the filesystem again
+DISK_SPACE_CACHE_TTL = 2.0
+# Multiplier converting bytes to GB
+_GB = 1.0 / (1024 * 1024 * 1024)
+# Minimum seconds between progress writes to a download's status
+PROGRESS_UPDATE_INTERVAL = 0.25
+# Seconds a failed download stays tracked after its notification has been sent
+FAILED_DOWNLOAD_RETENTION = 60
+# Fewest downloads removed in one cleanup before rebuilding the dicts beats deleting entries
+CLEANUP_REBUILD_MIN = 64
+# Most finished downloads kept before the oldest reported ones are dropped regardless of age
+MAX_FINISHED_DOWNLOADS = 1000
+# Statuses after which a download can no longer be paused, resumed or cancelled
+TERMINAL_STATUSES = frozenset(('completed', 'failed', 'cancelled', 'timeout', 'error'))
+# Commands handled by _handle_control_command
+_CONTROL_COMMANDS = frozenset(('pause', 'resume', 'cancel'))
+
+
+def _parse_progress(line: str) -> Optional[float]:
+    """
+    Get the last progress percentage in a line of s5cmd output
+    
+    Args:
+        line: Output line, possibly holding several progress updates
+        
+    Returns:
+        The most recent percentage, or None if the line has none
+    """
+    end = line.rfind('%')
+    if end < 0:
+        return None
+        
+    # The last '%' nearly always ends the most recent percentage, so read the
+    # number right before it without going through the regex engine
+    start = end
+    while start and line[start - 1] in _PERCENT_CHARS:
+        start -= 1
+    number = line[start:end]
+    dot = number.find('.')
+    if 0 < dot < len(number) - 1 and number.count('.') == 1:
+        return float(number)
+        
+    # Unexpected format: fall back to the last match anywhere in the line
+    match = None
+    for match in _PROGRESS_RE.finditer(line):
+        pass
+    if match is None:
+        return None
+    return float(match.group(1))
+
+
+def _parse_ls_output(lines: List[str]) -> List[Dict[str, str]]:
+    """
+    Parse the output of s5cmd ls
+    
+    Args:
+        lines: stdout lines in the format <date> <time> <size> <key>
+        
+    Returns:
+        List of objects with key, size and last_modified
+    """
+    objects = []
+    for line in lines:
+        # The key may contain spaces, so split at most three times
+        parts = line.split(None, 3)
+        if len(parts) == 4:
+            date_str, time_str, size_str, key = parts
+            objects.append({
+                'key': key,
+                'size': size_str,
+                'last_modified': f"{date_str} {time_str}"
+            })
+    return objects
+
+
+async def _wait_with_timeout(awaitable: Awaitable, timeout: float) -> Any:
+    """
+    Await with a timeout, cancelling the awaitable when it expires
+    
+    Uses asyncio.timeout() where available (Python 3.11+), which runs the
+    awaitable in the current task instead of wrapping it in a new one.
+    
+    Raises:
+        asyncio.TimeoutError: If the timeout expires
+    """
+    if hasattr(asyncio, 'timeout'):
+        async with asyncio.timeout(timeout):
+            return await awaitable
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+class DownloadInfo:
+    """
+    State of a single download tracked by S3CommandManager
+    
+    Fields that only apply to some downloads or outcomes default to None.
+    Status and progress live in ``snapshot``, the entry reported for this
+    download in status messages, so it never has to be rebuilt.
+    """
+    __slots__ = (
+        'id', 'bucket', 'key', 'destination', 'command_id', 'model_meta', 'file_name',
+        'controller', 's5cmd_args', 'global_options', 'task', 'snapshot',
+        'start_time', 'start_ns', 'end_time', 'mono_end_time', 'pause_time', 'resume_time', 'last_progress_update',
+        'result', 'error', 'error_details', 'status_note', 'notification_sent', 'expiry_deadline'
+    )
+    
+    def __init__(self, download_id: str, bucket: str, key: str, destination: str, command_id: str,
+                 s5cmd_args: List[str], global_options: List[str],
+                 model_meta: Optional[Dict[str, Any]] = None):
+        self.id = download_id
+        self.bucket = bucket
+        self.key = key
+        self.destination = destination
+        self.command_id = command_id
+        self.model_meta = model_meta
+        self.file_name = '*' if key.endswith('/') else key
+        # Each download runs its own s5cmd process so control commands target it alone
+        self.controller = AsyncS5CommandController()
+        self.s5cmd_args = s5cmd_args
+        self.global_options = global_options
+        self.task: Optional[asyncio.Task] = None
+        self.snapshot: Dict[str, Any] = {
+            'download_id': download_id,
+            'bucket': bucket,
+            'key': key,
+            'status': 'starting',
+            'progress': 0.0,
+            'destination': destination
+        }
+        self.start_time = time.time()
+        # Monotonic start for measuring the duration, immune to wall-clock adjustments
+        self.start_ns = time.monotonic_ns()
+        self.end_time: Optional[float] = None
+        # Monotonic end, used for retention and reporting windows
+        self.mono_end_time: Optional[float] = None
+        self.pause_time: Optional[float] = None
+        self.resume_time: Optional[float] = None
+        # Monotonic time of the last progress write
+        self.last_progress_update: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.error_details: Optional[str] = None
+        self.status_note: Optional[str] = None
+        self.notification_sent = False
+        # Monotonic time when a failed download may be removed; set once its notification has been sent
+        self.expiry_deadline: Optional[float] = None
+        
+    @property
+    def status(self) -> str:
+        return self.snapshot['status']
+        
+    @status.setter
+    def status(self, status: str) -> None:
+        self.snapshot['status'] = status
+        
+    @property
+    def progress(self) -> float:
+        return self.snapshot['progress']
+        
+    @progress.setter
+    def progress(self, progress: float) -> None:
+        self.snapshot['progress'] = float(progress)
+
 
 class S3CommandManager:
     """
@@ -21,10 +197,30 @@ class S3CommandManager:
         self.default_download_dir = default_download_dir
         # Ensure the download directory exists
         os.makedirs(default_download_dir, exist_ok=True)
+        # Absolute paths of download directories already created
+        self._known_dirs: Set[str] = {os.path.abspath(default_download_dir)}
         
         # Store active downloads with their controllers and metadata
-        self.active_downloads: Dict[str, Dict[str, Any]] = {}
-        self.controller = AsyncS5CommandController()
+        self.active_downloads: Dict[str, DownloadInfo] = {}
+        # active_downloads grouped by status, kept up to date by _set_status and _remove;
+        # read-only for callers
+        self.downloads_by_status: Dict[str, Dict[str, DownloadInfo]] = defaultdict(dict)
+        # Min-heaps so cleanup only visits expired downloads: completed ones by
+        # (mono_end_time, download_id), failed ones by (expiry_deadline, download_id)
+        self._completed_heap: List[Tuple[float, str]] = []
+        self._failed_heap: List[Tuple[float, str]] = []
+        # Unsuccessful downloads as a (mono_end_time, download_id) min-heap, for recent_failures
+        self._recent_failures: List[Tuple[float, str]] = []
+        # IDs of finished downloads, oldest first, to cap how many are kept
+        self._finished: 'OrderedDict[str, None]' = OrderedDict()
+        # Completion and error notifications waiting to be published by the parent service
+        self.notifications: asyncio.Queue = asyncio.Queue()
+        # Set whenever a download changes status; cleared by whoever waits on it
+        self.state_changed = asyncio.Event()
+        # Recent disk space readings per path: (monotonic time, disk info)
+        self._disk_cache: Dict[str, Tuple[float, Dict[str, float]]] = {}
+        # Disk space queries running in a worker thread, per path, shared by concurrent callers
+        self._disk_queries: Dict[str, asyncio.Future] = {}
         
     async def execute_command(self, command_dict: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -53,7 +249,7 @@ class S3CommandManager:
                 'status': '...'      # Current status
             }
         """
-        logger.info(f"Executing command: {json.dumps(command_dict)}")
+        logger.info("Executing command: %s", LazyJson(command_dict))
         command_type = command_dict.get('command', '').lower()
         
         if not command_type:
@@ -63,7 +259,7 @@ class S3CommandManager:
             return await self._handle_download(command_dict)
         elif command_type == 'list':
             return await self._handle_list(command_dict)
-        elif command_type in ['pause', 'resume', 'cancel']:
+        elif command_type in _CONTROL_COMMANDS:
             return await self._handle_control_command(command_type, command_dict)
         elif command_type == 'getdetails':
             download_id = command_dict.get('download_id')
@@ -75,14 +271,14 @@ class S3CommandManager:
             # Create a sanitized copy of download info for response
             details = {
                 'download_id': download_id,
-                'bucket': download_info.get('bucket'),
-                'key': download_info.get('key'),
-                'destination': download_info.get('destination'),
-                'status': download_info.get('status'),
-                'progress': download_info.get('progress', 0),
-                'start_time': download_info.get('start_time'),
-                'end_time': download_info.get('end_time'),
-                'error_details': download_info.get('error_details')
+                'bucket': download_info.bucket,
+                'key': download_info.key,
+                'destination': download_info.destination,
+                'status': download_info.status,
+                'progress': download_info.progress,
+                'start_time': download_info.start_time,
+                'end_time': download_info.end_time,
+                'error_details': download_info.error_details
             }
             
             return {
@@ -91,35 +287,25 @@ class S3CommandManager:
             }
         elif command_type == 'disk-space':
             # Check disk space
-            disk_info = self.check_disk_space()
             return {
                 'success': True,
-                'disk_space': {
-                    'total_gb': round(disk_info['total_gb'], 2),
-                    'used_gb': round(disk_info['used_gb'], 2),
-                    'free_gb': round(disk_info['free_gb'], 2),
-                    'percent_used': round(disk_info['used_gb'] / disk_info['total_gb'] * 100, 2)
-                }
+                'disk_space': await self._disk_space_summary()
             }
         elif command_type == 'status':
             # Handle the status command
             # Get active downloads
-            active_downloads = []
-            for download_id, info in self.active_downloads.items():
-                # Only include active downloads
-                if info.get('status') in ['downloading', 'paused']:
-                    active_downloads.append({
-                        'download_id': download_id,
-                        'bucket': info.get('bucket'),
-                        'key': info.get('key'),
-                        'status': info.get('status'),
-                        'progress': float(info.get('progress', 0)),  # Ensure it's a float
-                        'destination': info.get('destination'),
-                        'start_time': info.get('start_time')
-                    })
-            
-            # Get disk space info
-            disk_info = self.check_disk_space()
+            active_downloads = [
+                {
+                    'download_id': download_id,
+                    'bucket': info.bucket,
+                    'key': info.key,
+                    'status': info.status,
+                    'progress': float(info.progress),  # Ensure it's a float
+                    'destination': info.destination,
+                    'start_time': info.start_time
+                }
+                for download_id, info in self._iter_active()
+            ]
             
             # Return the status - maintaining consistent structure with other commands
             return {
@@ -130,12 +316,7 @@ class S3CommandManager:
                 'system_info': {
                     'active_downloads': len(active_downloads),
                     'downloads': active_downloads,
-                    'disk_space': {
-                        'total_gb': round(disk_info['total_gb'], 2),
-                        'used_gb': round(disk_info['used_gb'], 2),
-                        'free_gb': round(disk_info['free_gb'], 2),
-                        'percent_used': round(disk_info['used_gb'] / disk_info['total_gb'] * 100, 2)
-                    }
+                    'disk_space': await self._disk_space_summary()
                 }
             }
         else:
@@ -149,12 +330,11 @@ class S3CommandManager:
         command_id = command_dict.get('command_id')
         if not command_id:
             # Generate a fallback command ID if none was provided
-            command_id = f"auto-{str(uuid.uuid4())[:8]}"
+            command_id = f"auto-{secrets.token_hex(4)}"
             logger.warning(f"No command_id provided, generated fallback: {command_id}")
         
-        # Log the full command dictionary to see what's incoming
-        logger.info(f"Download command received: {json.dumps(command_dict)}")
-        logger.info(f"Command ID received: {command_id}")
+        # The full command dictionary was already logged by execute_command
+        logger.info("Command ID received: %s", command_id)
                 
         if not bucket or not key:
             return {'success': False, 'error': 'Missing required parameters: bucket and key'}
@@ -168,7 +348,10 @@ class S3CommandManager:
         
         # Determine destination path
         destination = command_dict.get('destination', self.default_download_dir)
-        os.makedirs(destination, exist_ok=True)
+        destination_dir = os.path.abspath(destination)
+        if destination_dir not in self._known_dirs:
+            os.makedirs(destination_dir, exist_ok=True)
+            self._known_dirs.add(destination_dir)
         
         # Extract other parameters with defaults
         numworkers = command_dict.get('numworkers', 256)
@@ -186,70 +369,45 @@ class S3CommandManager:
                 model_id = os.path.splitext(filename)[0]  # Remove extension
                 # If still empty, use a generic name
                 if not model_id:
-                    model_id = f"model-{str(uuid.uuid4())[:8]}"
+                    model_id = f"model-{secrets.token_hex(4)}"
                     
                 model_meta['model_id'] = model_id
                 
             # Log model metadata
-            logger.info(f"Model metadata included in download command: {json.dumps(model_meta)}")
+            logger.info("Model metadata included in download command: %s", LazyJson(model_meta))
                 
-        # Build the s5cmd command
-        s5cmd_args = []
-         
-        # Add command and its parameters
-        s5cmd_args.append("cp")
-        s5cmd_args.extend(["--concurrency", str(concurrency)])
-        s5cmd_args.extend(["--show-progress"])
-        
         # Source and destination - handle directory downloads correctly
         if key.endswith('/'):
             s3_path = f"s3://{bucket}/{key}*"  # Add wildcard for directories
         else:
             s3_path = f"s3://{bucket}/{key}"
         
-        s5cmd_args.extend([s3_path, destination])
+        # Build the s5cmd command and its parameters
+        s5cmd_args = ["cp", "--concurrency", str(concurrency), "--show-progress", s3_path, destination]
 
         # Store global options separately
-        global_options = []
-        global_options.extend(["--numworkers", str(numworkers)])
-        global_options.extend(["--retry-count", str(retry_count)])
-        
+        global_options = ["--numworkers", str(numworkers), "--retry-count", str(retry_count)]
         if s3_transfer_acceleration:
             global_options.append("--use-accelerate-endpoint")
 
         # Create an entry for this download
-        download_info = {
-            'id': download_id,
-            'bucket': bucket,
-            'key': key,
-            'destination': destination,
-            'start_time': time.time(),
-            'status': 'starting',
-            'progress': 0,
-            'controller': self.controller,
-            's5cmd_args': s5cmd_args,
-            'global_options': global_options,
-            'file_name': '*' if key.endswith('/') else key,
-            'task': None,
-            'command_id': command_id
-        }
-
-        # Store model metadata if provided
-        if model_meta:
-            download_info['model_meta'] = model_meta
+        download_info = DownloadInfo(
+            download_id, bucket, key, destination, command_id,
+            s5cmd_args, global_options, model_meta
+        )
             
         # Log the download info to verify command_id is stored
-        logger.info(f"Created download info with command_id: {download_info.get('command_id')}")
-        logger.info(f"Download info keys: {list(download_info.keys())}")
+        logger.info("Created download info with command_id: %s", download_info.command_id)
 
         self.active_downloads[download_id] = download_info
+        self.downloads_by_status[download_info.status][download_id] = download_info
         
         # Create a task for the download that will manage its execution and completion
         download_task = asyncio.create_task(
-            self._execute_download(download_id, s5cmd_args, global_options, download_timeout)
+            self._execute_download(download_id, download_info.controller, s5cmd_args, global_options, download_timeout)
         )
-        download_info['task'] = download_task
-        download_info['status'] = 'downloading'
+        download_info.task = download_task
+        self._set_status(download_id, 'downloading')
         
         return {
             'success': True,
@@ -258,12 +416,14 @@ class S3CommandManager:
             'status': 'downloading'
         }
     
-    async def _execute_download(self, download_id: str, s5cmd_args: List[str], global_options: List[str], timeout: int) -> None:
+    async def _execute_download(self, download_id: str, controller: AsyncS5CommandController,
+                                s5cmd_args: List[str], global_options: List[str], timeout: int) -> None:
         """
         Execute the download operation and handle completion
         
         Args:
             download_id: The ID of the download
+            controller: Controller running this download's s5cmd process
             s5cmd_args: Arguments for s5cmd
             global_options: Arguments for global_options of s5cmd
             timeout: Timeout in seconds
@@ -275,47 +435,48 @@ class S3CommandManager:
         
         logger.info(f"Starting download {download_id}: s5cmd {' '.join(global_options + s5cmd_args)}")
         
-        # Store first and last error message
-        error_messages = []
-        last_progress_update = time.time()
+        # Keep only the most recent stderr lines; at most the last 5 are ever reported
+        error_messages = deque(maxlen=5)
+        # Highest progress seen, and when (monotonic) it was last written to the download info
+        latest_progress = 0
+        last_progress_update = float('-inf')
         
         try:
             # Define callback for real-time progress updates and error capture
             async def progress_callback(output_type, line):
-                nonlocal last_progress_update
+                nonlocal latest_progress, last_progress_update
                 
-                if download_id not in self.active_downloads:
+                info = self.active_downloads.get(download_id)
+                if info is None:
                     return
                     
                 if output_type == "stderr":
-                    # Try to extract progress percentage using regex
-                    progress_pattern = r'(\d+\.\d+)%'
-                    matches = re.findall(progress_pattern, line)
+                    # Use the last percentage found in the line (most recent progress)
+                    progress = _parse_progress(line)
                     
-                    if matches:
-                        # Get the last match (most recent percentage)
-                        try:
-                            progress = float(matches[-1])  # Use the last percentage found in the line
-                            current_progress = self.active_downloads[download_id].get('progress', 0)
-                            if progress > current_progress:
-                                self.active_downloads[download_id]['progress'] = progress
-                                self.active_downloads[download_id]['last_progress_update'] = time.time()
-                                last_progress_update = time.time()
-                                logger.info(f"Download {download_id} progress: {progress}%")
-                        except (ValueError, TypeError) as e:
-                            logger.debug(f"Error parsing progress from line: {line}, error: {e}")
+                    if progress is not None and progress > latest_progress:
+                        latest_progress = progress
+                        # Status is polled far less often than s5cmd reports progress
+                        now = time.monotonic()
+                        if now - last_progress_update >= PROGRESS_UPDATE_INTERVAL:
+                            info.progress = progress
+                            info.last_progress_update = last_progress_update = now
+                            logger.info("Download %s progress: %s%%", download_id, progress)
                     
-                    # Check for specific error messages
-                    if "no space left on device" in line.lower():
+                    # Check for specific error messages; s5cmd may report a full disk
+                    # once per file, but only the first report ends the download
+                    if _NO_SPACE in line.lower():
+                        if info.status in TERMINAL_STATUSES:
+                            return
+                            
                         # Preserve current progress when error occurs
-                        current_progress = self.active_downloads[download_id].get('progress', 0)
-                        error_message = f"No space left on device at {current_progress}% progress"
+                        info.progress = latest_progress
+                        error_message = f"No space left on device at {latest_progress}% progress"
                         logger.error(f"Download {download_id} failed: {error_message}")
                         
                         error_messages.append(error_message)
-                        self.active_downloads[download_id]['status'] = 'failed'
-                        self.active_downloads[download_id]['error_details'] = error_message
-                        self.active_downloads[download_id]['end_time'] = time.time()
+                        self._finish(download_id, 'failed')
+                        info.error_details = error_message
                         
                         # Publish error notification directly
                         await self.publish_error_notification(
@@ -325,7 +486,7 @@ class S3CommandManager:
                         )
                         
                         # Try to cancel the download
-                        await self.controller.cancel()
+                        await controller.cancel()
                         
                     # Store stderr lines as potential error messages
                     elif line.strip():
@@ -333,33 +494,42 @@ class S3CommandManager:
             
             # Start the download with a timeout
             try:
-                result = await asyncio.wait_for(
-                    self.controller.execute_and_wait(s5cmd_args, global_options, callback=progress_callback),
-                    timeout=timeout
-                )
+                try:
+                    result = await _wait_with_timeout(
+                        controller.execute_and_wait(s5cmd_args, global_options, callback=progress_callback),
+                        timeout
+                    )
+                finally:
+                    # Record progress reported since the last throttled write
+                    download_info = self.active_downloads.get(download_id)
+                    if download_info is not None and latest_progress > download_info.progress:
+                        download_info.progress = latest_progress
                 
-                # Update download info with result
-                if download_id in self.active_downloads:
-                    download_info = self.active_downloads[download_id]
-                    previous_status = download_info.get('status')
+                # Update download info with result, unless it stopped being tracked meanwhile
+                download_info = self.active_downloads.get(download_id)
+                if download_info is not None:
+                    download_info.result = result
                     
+                    # Already finished and reported, e.g. stopped because the disk is full
+                    if download_info.status in TERMINAL_STATUSES:
+                        logger.info("Download %s ended with status %s", download_id, download_info.status)
+                        
+                    # Stopped by a cancel command, which sends the response itself
+                    elif result.get('state') == 'cancelled':
+                        self._finish(download_id, 'cancelled')
+                        
                     # Handle unsuccessful downloads explicitly
-                    if not result['success']:
+                    elif not result['success']:
                         error_msg = "Download failed with s5cmd error"
-                        download_info['status'] = 'failed'
-                        download_info['end_time'] = time.time()
-                        download_info['result'] = result
+                        self._finish(download_id, 'failed')
                         
                         # Get error details from collected stderr messages
                         if error_messages:
-                            if len(error_messages) > 5:
-                                detailed_msg = '\n'.join(error_messages[-5:])
-                            else:
-                                detailed_msg = '\n'.join(error_messages)
+                            detailed_msg = '\n'.join(error_messages)
                         else:
                             detailed_msg = f"Return code: {result.get('return_code')}, State: {result.get('state')}"
                         
-                        download_info['error_details'] = detailed_msg
+                        download_info.error_details = detailed_msg
                         logger.error(f"Download {download_id} failed: {error_msg}")
                         logger.error(f"Error details: {detailed_msg[:100]}...")
                         
@@ -367,9 +537,7 @@ class S3CommandManager:
                         await self.publish_error_notification(download_id, error_msg, detailed_msg)
                     else:
                         # Handle successful downloads
-                        download_info['status'] = 'completed'
-                        download_info['end_time'] = time.time()
-                        download_info['result'] = result
+                        self._finish(download_id, 'completed')
                         logger.info(f"Download {download_id} completed successfully")
                         
                         # Publish success notification
@@ -380,37 +548,36 @@ class S3CommandManager:
                 timeout_msg = f"Download timed out after {timeout} seconds"
                 logger.error(f"Download {download_id} {timeout_msg}")
                 
-                if download_id in self.active_downloads:
-                    self.active_downloads[download_id]['status'] = 'timeout'
-                    self.active_downloads[download_id]['error_details'] = timeout_msg
-                    self.active_downloads[download_id]['end_time'] = time.time()
+                download_info = self.active_downloads.get(download_id)
+                if download_info is not None and download_info.status not in TERMINAL_STATUSES:
+                    self._finish(download_id, 'timeout')
+                    download_info.error_details = timeout_msg
                     
                     # Include any collected error messages
                     if error_messages:
-                        detailed_msg = f"{timeout_msg}. Last errors:\n" + '\n'.join(error_messages[-3:])
+                        detailed_msg = f"{timeout_msg}. Last errors:\n" + '\n'.join(list(error_messages)[-3:])
                     else:
                         detailed_msg = timeout_msg
                     
                     # Publish error notification for timeout
                     await self.publish_error_notification(download_id, "Download timed out", detailed_msg)
                     
-                    # Try to cancel the download
-                    await self.controller.cancel()
+                # Try to cancel the download
+                await controller.cancel()
                     
         except Exception as e:
             # Handle any other errors during download execution
             error_msg = f"Error in download execution: {str(e)}"
-            logger.error(f"Download {download_id} failed: {error_msg}")
+            logger.exception("Download %s failed", download_id)
             
-            if download_id in self.active_downloads:
-                self.active_downloads[download_id]['status'] = 'error'
-                self.active_downloads[download_id]['error'] = str(e)
-                self.active_downloads[download_id]['end_time'] = time.time()
+            download_info = self.active_downloads.get(download_id)
+            if download_info is not None and download_info.status not in TERMINAL_STATUSES:
+                self._finish(download_id, 'error')
+                download_info.error = str(e)
                 
-                # Include traceback in error details
-                import traceback
-                error_details = f"{error_msg}\n{traceback.format_exc()}"
-                self.active_downloads[download_id]['error_details'] = error_details
+                # The full traceback is already logged; notifications only carry the exception itself
+                error_details = ''.join(traceback.format_exception_only(type(e), e))[:256]
+                download_info.error_details = error_details
                 
                 # Publish error notification
                 await self.publish_error_notification(download_id, error_msg, error_details)
@@ -429,9 +596,8 @@ class S3CommandManager:
             return
 
         # Get the command ID from download info - with debug logging
-        command_id = download_info.get('command_id')
+        command_id = download_info.command_id
         logger.info(f"Creating error notification for download {download_id}, command_id: {command_id}")
-        logger.info(f"Download info keys: {list(download_info.keys())}")
                     
         # Create an error notification event
         notification = {
@@ -440,10 +606,10 @@ class S3CommandManager:
             'success': False,
             'status': 'failed',
             'error': error_message,
-            'progress': download_info.get('progress', 0),
+            'progress': download_info.progress,
             'command_id': command_id,
-            'bucket': download_info.get('bucket'),
-            'key': download_info.get('key')
+            'bucket': download_info.bucket,
+            'key': download_info.key
         }
         
         if error_details:
@@ -452,8 +618,8 @@ class S3CommandManager:
             else:
                 notification['error_details'] = error_details
         
-        # Signal to the parent service to publish this notification
-        download_info['error_notification'] = notification
+        # Hand the notification to the parent service for publishing
+        self.notifications.put_nowait(notification)
         logger.info(f"Created error notification for download {download_id} with command_id: {command_id}")
 
     async def publish_completion_notification(self, download_id: str, success: bool):
@@ -464,23 +630,26 @@ class S3CommandManager:
             download_id: The ID of the download
             success: Whether the download succeeded
         """
-        download_info = self.active_downloads.get(download_id, {})
+        download_info = self.active_downloads.get(download_id)
+        if download_info is None:
+            return
+        duration = (time.monotonic_ns() - download_info.start_ns) / 1e9
         
         notification = {
             'event': 'download_completed',
             'download_id': download_id,
             'success': success,
-            'status': download_info.get('status', 'unknown'),
-            'progress': download_info.get('progress', 0),
-            'bucket': download_info.get('bucket'),
-            'key': download_info.get('key'),
-            'destination': download_info.get('destination'),
-            'duration': time.time() - download_info.get('start_time', time.time()),
-            'command_id': download_info.get('command_id')
+            'status': download_info.status,
+            'progress': download_info.progress,
+            'bucket': download_info.bucket,
+            'key': download_info.key,
+            'destination': download_info.destination,
+            'duration': duration,
+            'command_id': download_info.command_id
         }
         
-        # Signal to the parent service to publish this notification
-        download_info['completion_notification'] = notification
+        # Hand the notification to the parent service for publishing
+        self.notifications.put_nowait(notification)
         logger.info(f"Created completion notification for download {download_id}")
         
     async def _handle_list(self, command_dict: Dict[str, Any]) -> Dict[str, Any]:
@@ -489,17 +658,18 @@ class S3CommandManager:
         
         if list_type == 'downloads':
             # List active downloads
-            downloads_list = []
-            for download_id, info in self.active_downloads.items():
-                downloads_list.append({
+            downloads_list = [
+                {
                     'download_id': download_id,
-                    'bucket': info.get('bucket'),
-                    'key': info.get('key'),
-                    'status': info.get('status'),
-                    'progress': info.get('progress', 0),
-                    'destination': info.get('destination'),
-                    'start_time': info.get('start_time')
-                })
+                    'bucket': info.bucket,
+                    'key': info.key,
+                    'status': info.status,
+                    'progress': info.progress,
+                    'destination': info.destination,
+                    'start_time': info.start_time
+                }
+                for download_id, info in self.active_downloads.items()
+            ]
             return {
                 'success': True,
                 'downloads': downloads_list
@@ -515,42 +685,33 @@ class S3CommandManager:
             # Build s5cmd command for listing
             s5cmd_args = ["ls", f"s3://{bucket}/{prefix}"]
             
-            # Execute the list command
-            objects = []
+            # Execute the list command; stdout is parsed once it has finished
+            stdout_lines = []
             error_messages = []
             
             def collect_output(output_type, line):
-                if output_type == "stdout" and line.strip():
-                    # Parse s5cmd output and extract object info
-                    # Format: <date> <time> <size> <key>
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        date_str = parts[0]
-                        time_str = parts[1]
-                        size_str = parts[2]
-                        key = ' '.join(parts[3:])
-                        
-                        objects.append({
-                            'key': key,
-                            'size': size_str,
-                            'last_modified': f"{date_str} {time_str}"
-                        })
+                if output_type == "stdout":
+                    stdout_lines.append(line)
                 elif output_type == "stderr":
                     error_messages.append(line)
                     logger.warning(f"s5cmd stderr: {line}")
             
-            result = await self.controller.execute_and_wait(
+            # A separate controller, so listing does not interfere with running downloads
+            result = await AsyncS5CommandController().execute_and_wait(
                 command=s5cmd_args,
                 callback=collect_output
             )
             
+            # Parse off the event loop so large listings do not stall running downloads
+            objects = await asyncio.to_thread(_parse_ls_output, stdout_lines) if result['success'] else []
+            
             if not result['success'] and error_messages:
                 error_detail = '\n'.join(error_messages)
                 logger.error(f"List failed with errors: {error_detail}")
             
             return {
                 'success': result['success'],
-                'objects': objects if result['success'] else [],
+                'objects': objects,
                 'error': None if result['success'] else f"Failed to list objects: {result['state']}",
                 'error_details': '\n'.join(error_messages) if error_messages else None
             }
@@ -568,62 +729,180 @@ class S3CommandManager:
             return {'success': False, 'error': f'Download ID {download_id} not found'}
         
         download_info = self.active_downloads[download_id]
+        status = download_info.status
+        if status in TERMINAL_STATUSES:
+            return {
+                'success': False,
+                'download_id': download_id,
+                'status': status,
+                'error': f'Download {download_id} is already {status}'
+            }
+            
+        controller = download_info.controller
         
         if command_type == 'pause':
             # Pause the download
-            success = await self.controller.pause()
+            success = await controller.pause()
             if success:
-                download_info['status'] = 'paused'
-                download_info['pause_time'] = time.time()
+                self._set_status(download_id, 'paused')
+                download_info.pause_time = time.time()
                 
                 # Reset notification flag if it was set
-                if 'notification_sent' in download_info:
-                    download_info.pop('notification_sent')
+                download_info.notification_sent = False
                     
             return {
                 'success': success,
                 'download_id': download_id,
-                'status': download_info['status'],
+                'status': download_info.status,
                 'message': f"Download {download_id} {'paused successfully' if success else 'could not be paused'}"
             }
             
         elif command_type == 'resume':
             # Resume the download
-            success = await self.controller.resume()
+            success = await controller.resume()
             if success:
                 # Update status
-                download_info['status'] = 'downloading'
-                download_info['resume_time'] = time.time()
+                self._set_status(download_id, 'downloading')
+                download_info.resume_time = time.time()
                 
                 # Reset notification flag if it was set
-                if 'notification_sent' in download_info:
-                    download_info.pop('notification_sent')
+                download_info.notification_sent = False
                     
             return {
                 'success': success,
                 'download_id': download_id,
-                'status': download_info['status'],
+                'status': download_info.status,
                 'message': f"Download {download_id} {'resumed successfully' if success else 'could not be resumed'}"
             }
             
         elif command_type == 'cancel':
             # Cancel the download
-            success = await self.controller.cancel()
-            if success:
-                download_info['status'] = 'cancelled'
-                download_info['end_time'] = time.time()
+            success = await controller.cancel()
+            # The download task may already have recorded the cancellation
+            if success and download_info.status not in TERMINAL_STATUSES:
+                self._finish(download_id, 'cancelled')
                 
                 # Mark the download as having sent a notification
                 # This will remove it from the status report after the timeout
-                download_info['notification_sent'] = False
+                download_info.notification_sent = False
                 
             return {
                 'success': success,
                 'download_id': download_id,
-                'status': download_info['status'],
+                'status': download_info.status,
                 'message': f"Download {download_id} {'cancelled successfully' if success else 'could not be cancelled'}"
             }
     
+    def _set_status(self, download_id: str, status: str) -> None:
+        """
+        Update the status of a download, keeping the status index in sync
+        
+        Args:
+            download_id: The ID of the download
+            status: New status
+        """
+        download_info = self.active_downloads.get(download_id)
+        if download_info is None:
+            return
+            
+        self.downloads_by_status[download_info.status].pop(download_id, None)
+        download_info.status = status
+        self.downloads_by_status[status][download_id] = download_info
+        self.state_changed.set()
+        
+    def _finish(self, download_id: str, status: str) -> None:
+        """
+        Move a download to a final status and schedule it for cleanup
+        
+        Args:
+            download_id: The ID of the download
+            status: Final status
+        """
+        download_info = self.active_downloads.get(download_id)
+        if download_info is None:
+            return
+            
+        self._set_status(download_id, status)
+        download_info.end_time = time.time()
+        download_info.mono_end_time = end_time = time.monotonic()
+        if status == 'completed':
+            heapq.heappush(self._completed_heap, (end_time, download_id))
+        else:
+            heapq.heappush(self._recent_failures, (end_time, download_id))
+            if download_info.notification_sent:
+                self._schedule_expiry(download_info)
+                
+        self._finished[download_id] = None
+        self._finished.move_to_end(download_id)
+            
+    def _schedule_expiry(self, download_info: DownloadInfo) -> None:
+        """
+        Set the deadline after which a failed download is removed and queue it for cleanup
+        
+        Args:
+            download_info: A failed download whose notification has been sent
+        """
+        download_info.expiry_deadline = deadline = download_info.mono_end_time + FAILED_DOWNLOAD_RETENTION
+        heapq.heappush(self._failed_heap, (deadline, download_info.id))
+        
+    def mark_notification_sent(self, download_id: str) -> None:
+        """
+        Record that the outcome of a download has been reported
+        
+        Failed downloads become eligible for cleanup FAILED_DOWNLOAD_RETENTION
+        seconds after they ended once this is called.
+        
+        Args:
+            download_id: The ID of the download
+        """
+        download_info = self.active_downloads.get(download_id)
+        if download_info is None or download_info.notification_sent:
+            return
+            
+        download_info.notification_sent = True
+        if download_info.mono_end_time is not None and download_info.status != 'completed':
+            self._schedule_expiry(download_info)
+        
+    def _remove(self, download_id: str) -> Optional[DownloadInfo]:
+        """
+        Stop tracking a download
+        
+        Args:
+            download_id: The ID of the download
+            
+        Returns:
+            The removed download, or None if it was not tracked
+        """
+        download_info = self.active_downloads.pop(download_id, None)
+        if download_info is not None:
+            self.downloads_by_status[download_info.status].pop(download_id, None)
+            self._finished.pop(download_id, None)
+        return download_info
+        
+    def recent_failures(self, since: float) -> List[Tuple[str, DownloadInfo]]:
+        """
+        Get downloads that ended unsuccessfully after a point in time
+        
+        Args:
+            since: time.monotonic() value; failures up to this time are forgotten
+            
+        Returns:
+            List of (download_id, info) tuples
+        """
+        heap = self._recent_failures
+        while heap and heap[0][0] <= since:
+            heapq.heappop(heap)
+            
+        # Skip entries for downloads that are gone or were finished again later
+        return [
+            (download_id, info) for end_time, download_id in heap
+            if (info := self.active_downloads.get(download_id)) is not None and info.mono_end_time == end_time
+        ]
+        
+    def _iter_active(self) -> Iterator[Tuple[str, DownloadInfo]]:
+        """Iterate over (download_id, info) of downloads that are downloading or paused"""
+        return chain(self.downloads_by_status['downloading'].items(), self.downloads_by_status['paused'].items())
+    
     def get_download_status(self, download_id: str) -> Optional[Dict[str, Any]]:
         """
         Get the status of a specific download
@@ -640,63 +919,93 @@ class S3CommandManager:
         download_info = self.active_downloads[download_id]
         return {
             'download_id': download_id,
-            'bucket': download_info.get('bucket'),
-            'key': download_info.get('key'),
-            'status': download_info.get('status'),
-            'progress': download_info.get('progress', 0),
-            'destination': download_info.get('destination'),
-            'start_time': download_info.get('start_time'),
-            'end_time': download_info.get('end_time', None)
+            'bucket': download_info.bucket,
+            'key': download_info.key,
+            'status': download_info.status,
+            'progress': download_info.progress,
+            'destination': download_info.destination,
+            'start_time': download_info.start_time,
+            'end_time': download_info.end_time
         }
 
-    async def monitor_active_downloads(self) -> None:
+    def monitor_active_downloads(self) -> int:
         """
         Periodically monitor active downloads and log their status
+        
+        Returns:
+            Number of downloads that are downloading or paused
         """
-        active_count = 0
-        for download_id, info in self.active_downloads.items():
-            if info.get('status') in ['downloading', 'paused']:
-                active_count += 1
-                progress = info.get('progress', 0)
-                logger.info(f"Active download: {download_id}, status: {info.get('status')}, progress: {progress}%")
+        if logger.isEnabledFor(logging.INFO):
+            for download_id, info in self._iter_active():
+                logger.info("Active download: %s, status: %s, progress: %s%%", download_id, info.status, info.progress)
         
-        return active_count
+        return len(self.downloads_by_status['downloading']) + len(self.downloads_by_status['paused'])
 
-    def cleanup_completed_downloads(self, max_age_seconds: int = 3600) -> int:
+    def cleanup_completed_downloads(self, max_age_seconds: int = 3600, now: Optional[float] = None) -> int:
         """
         Remove completed/failed/cancelled downloads older than the specified age
         
         Args:
             max_age_seconds: Maximum age in seconds to keep completed downloads
+            now: time.monotonic() value to use, read here if not given
                 
         Returns:
             Number of downloads removed
         """
-        current_time = time.time()
+        current_time = time.monotonic() if now is None else now
         to_remove = []
         
-        for download_id, info in self.active_downloads.items():
-            status = info.get('status')
-            end_time = info.get('end_time')
-            
-            if status in ['completed', 'failed', 'cancelled', 'error', 'timeout'] and end_time:
-                # For failed downloads, check both age and if notification has been sent
-                if status in ['failed', 'cancelled', 'error', 'timeout']:
-                    # If notification has been sent and at least 60 seconds have passed
-                    # since the download ended, we can remove it
-                    notification_sent = info.get('notification_sent', False)
-                    notification_age = current_time - end_time
-                    
-                    if notification_sent and notification_age > 60:
-                        to_remove.append(download_id)
-                # For completed downloads, use the regular max_age_seconds
-                elif status == 'completed' and current_time - end_time > max_age_seconds:
-                    to_remove.append(download_id)
+        # Completed downloads use the regular max_age_seconds
+        heap = self._completed_heap
+        cutoff = current_time - max_age_seconds
+        while heap and heap[0][0] < cutoff:
+            end_time, download_id = heapq.heappop(heap)
+            info = self.active_downloads.get(download_id)
+            # Skip entries for downloads that are gone or were finished again later
+            if info is not None and info.mono_end_time == end_time and info.status == 'completed':
+                to_remove.append(download_id)
+                
+        # Failed downloads carry their own deadline, set once their notification was sent
+        heap = self._failed_heap
+        while heap and heap[0][0] < current_time:
+            deadline, download_id = heapq.heappop(heap)
+            info = self.active_downloads.get(download_id)
+            if info is not None and info.expiry_deadline == deadline and info.notification_sent:
+                to_remove.append(download_id)
+                
+        # Past the cap, also drop the oldest finished downloads whose outcome has been
+        # reported; unreported ones are still needed for their notification or status
+        excess = len(self._finished) - len(to_remove) - MAX_FINISHED_DOWNLOADS
+        if excess > 0:
+            expiring = set(to_remove)
+            evicted = []
+            for download_id in self._finished:
+                if len(evicted) == excess:
+                    break
+                if download_id not in expiring and self.active_downloads[download_id].notification_sent:
+                    evicted.append(download_id)
+            if evicted:
+                logger.info("Too many finished downloads, dropped %d oldest reported ones from tracking", len(evicted))
+                to_remove.extend(evicted)
         
-        # Remove the old downloads
-        for download_id in to_remove:
-            self.active_downloads.pop(download_id, None)
-            logger.info(f"Removed download {download_id} from tracking")
+        if not to_remove:
+            return 0
+            
+        # Remove the old downloads; when a large batch making up a large share of them
+        # expires at once, copying the survivors is cheaper than deleting entries one by one
+        if len(to_remove) >= CLEANUP_REBUILD_MIN and len(to_remove) > len(self.active_downloads) // 4:
+            removed = set(to_remove)
+            self.active_downloads = {k: v for k, v in self.active_downloads.items() if k not in removed}
+            for status in TERMINAL_STATUSES:
+                downloads = self.downloads_by_status.get(status)
+                if downloads:
+                    self.downloads_by_status[status] = {k: v for k, v in downloads.items() if k not in removed}
+            for download_id in to_remove:
+                self._finished.pop(download_id, None)
+        else:
+            for download_id in to_remove:
+                self._remove(download_id)
+        logger.info("Removed %d downloads from tracking: %s", len(to_remove), to_remove)
             
         return len(to_remove)
 
@@ -704,21 +1013,71 @@ class S3CommandManager:
         """
         Check available disk space
         
+        Readings are cached per path for DISK_SPACE_CACHE_TTL seconds.
+        
         Args:
             path: Path to check
             
         Returns:
-            Dictionary with total, used, and free space in GB
+            Dictionary with total, used, and free space in GB and the percentage used
         """
-        import shutil
+        now = time.monotonic()
+        cached = self._disk_cache.get(path)
+        if cached is not None and now - cached[0] < DISK_SPACE_CACHE_TTL:
+            return cached[1]
+            
         total, used, free = shutil.disk_usage(path)
         # Convert to GB
-        total_gb = total / (1024 * 1024 * 1024)
-        used_gb = used / (1024 * 1024 * 1024)
-        free_gb = free / (1024 * 1024 * 1024)
+        total_gb = total * _GB
+        used_gb = used * _GB
+        free_gb = free * _GB
         
-        return {
+        disk_info = {
             'total_gb': total_gb,
             'used_gb': used_gb,
-            'free_gb': free_gb
+            'free_gb': free_gb,
+            'percent_used': used_gb / total_gb * 100 if total_gb else 0.0
+        }
+        self._disk_cache[path] = (now, disk_info)
+        return disk_info
+        
+    async def check_disk_space_async(self, path: str = "./") -> Dict[str, float]:
+        """
+        Check available disk space without blocking the event loop
+        
+        Cached readings are returned directly; otherwise the filesystem is
+        queried in a worker thread, as it may be slow on network mounts.
+        Concurrent callers share a single query per path.
+        
+        Args:
+            path: Path to check
+            
+        Returns:
+            Dictionary with total, used, and free space in GB and the percentage used
+        """
+        cached = self._disk_cache.get(path)
+        if cached is not None and time.monotonic() - cached[0] < DISK_SPACE_CACHE_TTL:
+            return cached[1]
+            
+        query = self._disk_queries.get(path)
+        if query is None:
+            query = asyncio.ensure_future(asyncio.to_thread(self.check_disk_space, path))
+            self._disk_queries[path] = query
+            query.add_done_callback(lambda _: self._disk_queries.pop(path, None))
+        # Shielded so a cancelled caller does not cancel the query for the others
+        return await asyncio.shield(query)
+        
+    async def _disk_space_summary(self) -> Dict[str, float]:
+        """
+        Get disk space rounded for command responses
+        
+        Returns:
+            Dictionary with total, used, and free space in GB and the percentage used
+        """
+        disk_info = await self.check_disk_space_async()
+        return {
+            'total_gb': round(disk_info['total_gb'], 2),
+            'used_gb': round(disk_info['used_gb'], 2),
+            'free_gb': round(disk_info['free_gb'], 2),
+            'percent_used': round(disk_info['percent_used'], 2)
         }
\ No newline at end of file
@@ -1,18 +1,37 @@
 import asyncio
-import json
 import time
-import uuid
+import traceback
+import secrets
 import os
-from typing import Dict, Any, Optional
+from itertools import chain
+from pathlib import PurePosixPath
+from typing import Dict, Any, Iterator, Optional
 
 from .utils.logging_config import get_logger
-from .s3_command_manager import S3CommandManager
+from .utils.json_utils import LazyJson, dumps_bytes
+from .s3_command_manager import DownloadInfo, S3CommandManager
 from .model_shadow_manager import ModelShadowManager
 from .mqtt_interface import MQTTInterface
 
 logger = get_logger(__name__)
 
 
+def _short_traceback(e: BaseException, limit: int = 3, max_length: int = 256) -> str:
+    """
+    Format the innermost frames of an exception's traceback for status messages
+    
+    Args:
+        e: The exception
+        limit: Number of innermost frames to format
+        max_length: Maximum length of the result, keeping its end
+        
+    Returns:
+        The formatted traceback, truncated to its last max_length characters
+    """
+    formatted = ''.join(traceback.format_exception(type(e), e, e.__traceback__, limit=-limit))
+    return formatted[-max_length:]
+
+
 class S3CommandService:
     """
     Main service that bridges MQTT communication with S3CommandManager
@@ -47,6 +66,14 @@ class S3CommandService:
 
         # Create model shadow manager
         self.model_shadow_manager = ModelShadowManager(mqtt_client, device_id)
+        
+        # Model commands are handled here; all other commands go to the command manager
+        self._model_handlers = {
+            'model_add': self._handle_model_add,
+            'model_get': self._handle_model_get,
+            'model_list': self._handle_model_list,
+            'model_delete': self._handle_model_delete
+        }
 
         # Setup topics
         self.command_topic = f"{topic_prefix}/{device_id}/commands"
@@ -56,6 +83,11 @@ class S3CommandService:
         # Control flags
         self.running = False
         self._process_task = None
+        self._notification_task = None
+        # (download_id, status, progress) of each download in the last status published,
+        # and when it was published
+        self._last_status_key = None
+        self._last_status_time = 0.0
         
     async def start(self) -> bool:
         """
@@ -92,6 +124,7 @@ class S3CommandService:
         # Start periodic processing
         self.running = True
         self._process_task = asyncio.create_task(self._periodic_processing())
+        self._notification_task = asyncio.create_task(self._process_download_notifications())
         
         # Publish initial status
         await self._publish_status()
@@ -103,12 +136,13 @@ class S3CommandService:
         logger.info("Stopping S3CommandService")
         self.running = False
         
-        if self._process_task:
-            self._process_task.cancel()
-            try:
-                await self._process_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._process_task, self._notification_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
             
         # Unsubscribe and disconnect
         await self.mqtt_client.unsubscribe(self.command_topic)
@@ -124,13 +158,13 @@ class S3CommandService:
         """
         # Auto-assign a command ID if not provided
         if 'command_id' not in payload:
-            payload['command_id'] = f"auto-{str(uuid.uuid4())[:8]}"
-            logger.info(f"Auto-assigned command ID: {payload['command_id']}")
+            payload['command_id'] = f"auto-{secrets.token_hex(4)}"
+            logger.info("Auto-assigned command ID: %s", payload['command_id'])
 
         command_id = payload.get('command_id', 'unknown')
         
         try:
-            logger.info(f"Received command: {json.dumps(payload)}")
+            logger.info("Received command: %s", LazyJson(payload))
             
             # Validate basic structure
             if not isinstance(payload, dict):
@@ -144,20 +178,19 @@ class S3CommandService:
                     'errorCode': 'INVALID_FORMAT',
                     'command_id': command_id
                 }
-                await self.mqtt_client.publish(self.response_topic, error_response)
                 
                 # Send detailed error in status topic
-                error_status = {
-                    'device_id': self.device_id,
-                    'timestamp': time.time(),
-                    'command_error': {
-                        'command_id': command_id,
-                        'message': error_msg,
-                        'details': f"Expected JSON object, received: {type(payload).__name__}",
-                        'payload': str(payload)[:200]  # Truncate long payloads
-                    }
-                }
-                await self.mqtt_client.publish(self.status_topic, error_status)
+                error_status = self._command_error_status(
+                    command_id,
+                    message=error_msg,
+                    details=f"Expected JSON object, received: {type(payload).__name__}",
+                    payload=str(payload)[:200]  # Truncate long payloads
+                )
+                # Publish the concise response and the detailed status together
+                await self.mqtt_client.publish_batch([
+                    (self.response_topic, error_response),
+                    (self.status_topic, error_status)
+                ])
                 return
                     
             command_type = payload.get('command')
@@ -172,20 +205,19 @@ class S3CommandService:
                     'errorCode': 'MISSING_COMMAND',
                     'command_id': command_id
                 }
-                await self.mqtt_client.publish(self.response_topic, error_response)
                 
                 # Send detailed error in status topic
-                error_status = {
-                    'device_id': self.device_id,
-                    'timestamp': time.time(),
-                    'command_error': {
-                        'command_id': command_id,
-                        'message': error_msg,
-                        'details': f"Command payload is missing required 'command' field",
-                        'received_fields': list(payload.keys())
-                    }
-                }
-                await self.mqtt_client.publish(self.status_topic, error_status)
+                error_status = self._command_error_status(
+                    command_id,
+                    message=error_msg,
+                    details="Command payload is missing required 'command' field",
+                    received_fields=list(payload.keys())
+                )
+                # Publish the concise response and the detailed status together
+                await self.mqtt_client.publish_batch([
+                    (self.response_topic, error_response),
+                    (self.status_topic, error_status)
+                ])
                 return
                 
             # Process the command
@@ -193,36 +225,20 @@ class S3CommandService:
                 command_id = payload.get('command_id')
 
                 # Handle model-related commands directly
-                if command_type == 'model_add':
-                    # Add or update a model directly (not through download)
-                    response = await self._handle_model_add(payload)
-                elif command_type == 'model_get':
-                    # Get details of a specific model
-                    response = await self._handle_model_get(payload)
-                elif command_type == 'model_list':
-                    # List all models
-                    response = await self._handle_model_list()
-                elif command_type == 'model_delete':
-                    # Delete a model
-                    response = await self._handle_model_delete(payload)
+                model_handler = self._model_handlers.get(command_type)
+                if model_handler is not None:
+                    response = await model_handler(payload)
                 else:
-                    # Handle regular commands, with special handling for model downloads
+                    # Handle regular commands; model downloads store their metadata on completion
                     if command_type == 'download' and 'model_meta' in payload:
-                        # Store download command with model metadata
-                        logger.info(f"Download command includes model metadata: {json.dumps(payload.get('model_meta'))}")
-                        response = await self.command_manager.execute_command(payload)
-                    else:
-                        # Regular command execution
-                        response = await self.command_manager.execute_command(payload)                
+                        logger.info("Download command includes model metadata: %s", LazyJson(payload.get('model_meta')))
+                    response = await self.command_manager.execute_command(payload)
                 
                 if command_id:
                     response['command_id'] = command_id
                     
-                # Publish the response
-                await self.mqtt_client.publish(
-                    self.response_topic,
-                    response
-                )
+                # The response, followed by error details for failed commands
+                messages = [(self.response_topic, response)]
                 
                 # If there was an error in command execution, send additional details in status
                 if not response.get('success', False) and 'error' in response:
@@ -234,22 +250,17 @@ class S3CommandService:
                     else:
                         truncated_details = error_details
 
-                    error_status = {
-                        'device_id': self.device_id,
-                        'timestamp': time.time(),
-                        'command_error': {
-                            'command_id': command_id,
-                            'command': command_type,
-                            'message': response.get('error'),
-                            'details': response.get('error_details', ''),
-                            # Include any additional context
-                            'system_state': {
-                                'disk_space': self.command_manager.check_disk_space() if hasattr(self.command_manager, 'check_disk_space') else None,
-                                'active_downloads': len(self.command_manager.active_downloads)
-                            }
-                        }
-                    }
-                    await self.mqtt_client.publish(self.status_topic, error_status)
+                    error_status = self._command_error_status(
+                        command_id,
+                        command=command_type,
+                        message=response.get('error'),
+                        details=truncated_details,
+                        # Include any additional context
+                        system_state=await self._system_state()
+                    )
+                    messages.append((self.status_topic, error_status))
+                    
+                await self.mqtt_client.publish_batch(messages)
                 
             except Exception as e:
                 logger.error(f"Error executing command: {e}")
@@ -261,30 +272,24 @@ class S3CommandService:
                     'errorCode': 'EXECUTION_ERROR',
                     'command_id': command_id
                 }
-                await self.mqtt_client.publish(self.response_topic, error_response)
                 
                 # Detailed error status
-                import traceback
-                error_status = {
-                    'device_id': self.device_id,
-                    'timestamp': time.time(),
-                    'command_error': {
-                        'command_id': command_id,
-                        'command': command_type,
-                        'message': str(e),
-                        'stack_trace': traceback.format_exc()[-256:],
-                        'system_state': {
-                            'disk_space': self.command_manager.check_disk_space() if hasattr(self.command_manager, 'check_disk_space') else None,
-                            'active_downloads': len(self.command_manager.active_downloads)
-                        }
-                    }
-                }
-                await self.mqtt_client.publish(self.status_topic, error_status)
+                error_status = self._command_error_status(
+                    command_id,
+                    command=command_type,
+                    message=str(e),
+                    stack_trace=_short_traceback(e),
+                    system_state=await self._system_state()
+                )
+                # Publish the concise response and the detailed status together
+                await self.mqtt_client.publish_batch([
+                    (self.response_topic, error_response),
+                    (self.status_topic, error_status)
+                ])
                 
         except Exception as e:
             logger.error(f"Unhandled error processing command: {e}")
             
-            import traceback
             # Send error response - basic info
             error_response = {
                 'success': False,
@@ -293,20 +298,42 @@ class S3CommandService:
                 'command_id': command_id
             }
             
-            await self.mqtt_client.publish(self.response_topic, error_response)
-            
             # Send detailed error status
-            error_status = {
-                'device_id': self.device_id,
-                'timestamp': time.time(),
-                'command_error': {
-                    'command_id': command_id,
-                    'message': str(e),
-                    'stack_trace': traceback.format_exc()[-256:],
-                    'raw_payload': str(payload)[:200]  # Truncate for safety
-                }
-            }
-            await self.mqtt_client.publish(self.status_topic, error_status)
+            error_status = self._command_error_status(
+                command_id,
+                message=str(e),
+                stack_trace=_short_traceback(e),
+                raw_payload=str(payload)[:200]  # Truncate for safety
+            )
+            # Publish the concise response and the detailed status together
+            await self.mqtt_client.publish_batch([
+                (self.response_topic, error_response),
+                (self.status_topic, error_status)
+            ])
+
+    def _command_error_status(self, command_id: Optional[str], **details: Any) -> Dict[str, Any]:
+        """
+        Build a status message describing a failed command
+        
+        Args:
+            command_id: ID of the failed command
+            **details: Other fields of the command_error entry, in order
+            
+        Returns:
+            Status message
+        """
+        return {
+            'device_id': self.device_id,
+            'timestamp': time.time(),
+            'command_error': {'command_id': command_id, **details}
+        }
+        
+    async def _system_state(self) -> Dict[str, Any]:
+        """Get disk space and the number of tracked downloads for error reports"""
+        return {
+            'disk_space': await self.command_manager.check_disk_space_async(),
+            'active_downloads': len(self.command_manager.active_downloads)
+        }
 
     async def _handle_model_add(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -338,9 +365,12 @@ class S3CommandService:
             
         return await self.model_shadow_manager.get_model(model_id)
         
-    async def _handle_model_list(self) -> Dict[str, Any]:
+    async def _handle_model_list(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle model_list command
+        
+        Args:
+            payload: Command payload (unused)
         """
         return await self.model_shadow_manager.get_all_models()
         
@@ -362,65 +392,65 @@ class S3CommandService:
         try:
             while self.running:
                 try:
-                    # Process download notifications
-                    await self._process_download_notifications()
-                    
                     # Monitor active downloads
-                    active_count = await self.command_manager.monitor_active_downloads()
+                    active_count = self.command_manager.monitor_active_downloads()
                     
-                    # Check for stalled downloads (no progress for a long time)
-                    current_time = time.time()
-                    for download_id, info in list(self.command_manager.active_downloads.items()):
-                        # Only check active downloads
-                        if info.get('status') not in ['downloading', 'paused']:
-                            continue
-                            
+                    # One monotonic reading serves the whole tick
+                    current_time = time.monotonic()
+                    
+                    # Check for stalled downloads (no progress for a long time);
+                    # last_progress_update is taken from the monotonic clock
+                    # Paused downloads make no progress by design, so only running ones are checked
+                    for download_id, info in self.command_manager.downloads_by_status['downloading'].items():
                         # Check if download has been updated recently
-                        last_update = info.get('last_progress_update')
+                        last_update = info.last_progress_update
                         if last_update and (current_time - last_update) > 300:  # 5 minutes
                             logger.warning(f"Download {download_id} may be stalled - no progress for 5 minutes")
                             
                             # Update status to indicate potential stall
-                            info['status_note'] = "Download may be stalled - no progress for 5 minutes"
+                            info.status_note = "Download may be stalled - no progress for 5 minutes"
                     
                     # Clean up completed downloads
-                    cleaned = self.command_manager.cleanup_completed_downloads()
+                    cleaned = self.command_manager.cleanup_completed_downloads(now=current_time)
                     if cleaned > 0:
                         logger.info(f"Cleaned up {cleaned} completed downloads")
                     
                     # Publish status update
-                    await self._publish_status()
+                    await self._publish_status(current_time)
                     
                     # Check system resources
-                    if hasattr(self.command_manager, 'check_disk_space'):
-                        disk_info = self.command_manager.check_disk_space()
-                        if disk_info and disk_info.get('free_gb', 0) < 1.0:  # Less than 1GB free
-                            logger.warning(f"Low disk space: {disk_info.get('free_gb'):.2f} GB free")
-                            
-                            # Publish low disk space warning
-                            await self.mqtt_client.publish(
-                                self.status_topic,
-                                {
-                                    'device_id': self.device_id,
-                                    'timestamp': time.time(),
-                                    'warning': "Low disk space",
-                                    'details': {
-                                        'free_gb': disk_info.get('free_gb'),
-                                        'total_gb': disk_info.get('total_gb'),
-                                        'used_gb': disk_info.get('used_gb')
-                                    }
+                    disk_info = await self.command_manager.check_disk_space_async()
+                    if disk_info and disk_info.get('free_gb', 0) < 1.0:  # Less than 1GB free
+                        logger.warning(f"Low disk space: {disk_info.get('free_gb'):.2f} GB free")
+                        
+                        # Publish low disk space warning
+                        await self.mqtt_client.publish(
+                            self.status_topic,
+                            {
+                                'device_id': self.device_id,
+                                'timestamp': time.time(),
+                                'warning': "Low disk space",
+                                'details': {
+                                    'free_gb': disk_info.get('free_gb'),
+                                    'total_gb': disk_info.get('total_gb'),
+                                    'used_gb': disk_info.get('used_gb')
                                 }
-                            )
+                            }
+                        )
                     
                     # Adjust sleep interval based on active downloads
                     sleep_time = self.process_interval if active_count > 0 else self.idle_process_interval
                     
-                    # Wait for next interval
-                    await asyncio.sleep(sleep_time)
+                    # Wait for next interval, or until a download changes status
+                    state_changed = self.command_manager.state_changed
+                    try:
+                        await asyncio.wait_for(state_changed.wait(), sleep_time)
+                    except asyncio.TimeoutError:
+                        pass
+                    state_changed.clear()
                         
                 except Exception as e:
                     logger.error(f"Error in periodic task: {e}")
-                    import traceback
                     logger.error(traceback.format_exc())
                     
                     # Use default interval on error
@@ -430,7 +460,6 @@ class S3CommandService:
             logger.info("Periodic processing task cancelled")
         except Exception as e:
             logger.error(f"Error in periodic processing: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             
             # Try to report the error
@@ -442,211 +471,209 @@ class S3CommandService:
                         'timestamp': time.time(),
                         'error': "Periodic processing error",
                         'details': str(e),
-                        'stack_trace': traceback.format_exc()[-256:]  # Truncate to last 256 characters
+                        'stack_trace': _short_traceback(e)
                     }
                 )
             except Exception as report_error:
                 logger.error(f"Failed to report error via MQTT: {report_error}")
 
-    async def _publish_status(self) -> None:
-        """Publish current status to status topic with improved filtering of downloads"""
+    def _unreported_failures(self, since: float) -> Iterator[DownloadInfo]:
+        """
+        Yield failed/cancelled/error downloads not yet reported, marking them as reported
+        
+        Args:
+            since: time.monotonic() value; downloads that ended earlier are skipped
+        """
+        for download_id, info in self.command_manager.recent_failures(since):
+            if not info.notification_sent:
+                # This prevents the download from appearing in future status reports
+                self.command_manager.mark_notification_sent(download_id)
+                yield info
+
+    async def _publish_status(self, current_time: Optional[float] = None) -> None:
+        """
+        Publish current status to status topic with improved filtering of downloads
+        
+        Args:
+            current_time: time.monotonic() value to use, read here if not given
+        """
         try:
-            # Get active downloads with better filtering
-            active_downloads = []
-            
-            current_time = time.time()
+            if current_time is None:
+                current_time = time.monotonic()
             notification_timeout = 60  # Show failed downloads for 60 seconds after failure
+            downloading = self.command_manager.downloads_by_status['downloading']
+            paused = self.command_manager.downloads_by_status['paused']
+            active_count = len(downloading) + len(paused)
             
-            for download_id, info in self.command_manager.active_downloads.items():
-                status = info.get('status')
-                
-                # Only include downloads based on specific criteria
-                if status == 'downloading':
-                    # Always include active downloads
-                    active_downloads.append({
-                        'download_id': download_id,
-                        'bucket': info.get('bucket'),
-                        'key': info.get('key'),
-                        'status': status,
-                        'progress': float(info.get('progress', 0.0)),  # Ensure it's a float
-                        'destination': info.get('destination')
-                    })
-                elif status == 'paused':
-                    # Always include paused downloads
-                    active_downloads.append({
-                        'download_id': download_id,
-                        'bucket': info.get('bucket'),
-                        'key': info.get('key'),
-                        'status': status,
-                        'progress': float(info.get('progress', 0.0)),
-                        'destination': info.get('destination')
-                    })
-                elif status == 'failed' or status == 'cancelled' or status == 'error' or status == 'timeout':
-                    # Only include failed/cancelled/error downloads if they're recent
-                    end_time = info.get('end_time', 0)
-                    
-                    # If the download failed/cancelled/errored within the notification timeout,
-                    # include it in status but only once (until notification is processed)
-                    if current_time - end_time < notification_timeout and not info.get('notification_sent', False):
-                        active_downloads.append({
-                            'download_id': download_id,
-                            'bucket': info.get('bucket'),
-                            'key': info.get('key'),
-                            'status': status,
-                            'progress': float(info.get('progress', 0.0)),
-                            'destination': info.get('destination')
-                        })
-                        
-                        # Mark that we've included this download in the status
-                        # This prevents it from appearing in future status reports
-                        info['notification_sent'] = True
+            # Always include active and paused downloads; failed ones only if they ended within
+            # the notification timeout, and only once. Each contributes its maintained snapshot
+            active_downloads = [
+                info.snapshot for info in chain(
+                    downloading.values(),
+                    paused.values(),
+                    self._unreported_failures(current_time - notification_timeout)
+                )
+            ]
+            
+            # Skip the publish when nothing changed, but still publish at least once
+            # per idle interval so subscribers can tell the device is alive
+            status_key = tuple((d['download_id'], d['status'], round(d['progress'], 2)) for d in active_downloads)
+            if status_key == self._last_status_key and current_time - self._last_status_time < self.idle_process_interval:
+                return
+            self._last_status_key = status_key
+            self._last_status_time = current_time
             
             # Build status message
             status = {
                 'device_id': self.device_id,
                 'timestamp': time.time(),
-                'active_downloads': len([d for d in active_downloads if d['status'] in ['downloading', 'paused']]),
+                'active_downloads': active_count,
                 'downloads': active_downloads
             }
             
-            # Publish status
-            await self.mqtt_client.publish(
-                self.status_topic,
-                status
-            )
+            # Publish status, serialized once here
+            await self.mqtt_client.publish_raw(self.status_topic, dumps_bytes(status))
             
         except Exception as e:
             logger.error(f"Error publishing status: {e}")
 
     async def _process_download_notifications(self) -> None:
-        """Process and handle download notifications with better status tracking"""
+        """Publish download notifications as the command manager queues them"""
+        notifications = self.command_manager.notifications
+        while True:
+            notification = await notifications.get()
+            try:
+                await self._handle_download_notification(notification)
+            except Exception as e:
+                logger.error(f"Error processing download notification: {e}")
+                
+    async def _handle_download_notification(self, notification: Dict[str, Any]) -> None:
+        """
+        Publish a single download notification with better status tracking
         
-        # Check for completed downloads with pending notifications
-        for download_id, info in list(self.command_manager.active_downloads.items()):
-            if 'completion_notification' in info:
-                notification = info.pop('completion_notification')
+        Args:
+            notification: Completion or error notification from the command manager
+        """
+        download_id = notification['download_id']
+        # The download may already have been cleaned up; it is only needed for bookkeeping
+        info = self.command_manager.active_downloads.get(download_id)
+        
+        if notification['event'] == 'download_completed':
+            # Send to response topic
+            response_msg = {
+                'event': 'download_completed',
+                'download_id': download_id,
+                'success': notification['success'],
+                'status': notification['status'],
+                'progress': notification['progress'],
+                'command_id': notification.get('command_id')
+            }
+            
+            # Add error information if failed
+            if not notification['success']:
+                response_msg['error'] = notification.get('error', 'Download failed')
+            
+            # Mark this download as having sent a notification
+            # This will prevent it from showing up in future status reports
+            self.command_manager.mark_notification_sent(download_id)
+            
+            # Report the completion right away; the shadow update below may take a round-trip
+            await self.mqtt_client.publish(self.response_topic, response_msg)
+            
+            # Follow-up messages about this completion are published together at the end
+            messages = []
+            
+            # Handle model metadata if this was a model download and it succeeded
+            if notification['success'] and info is not None and info.model_meta:
+                model_meta = info.model_meta
+                logger.info(f"Processing model metadata for completed download {download_id}")
                 
-                # Send to response topic
-                response_msg = {
-                    'event': 'download_completed',
-                    'download_id': download_id,
-                    'success': notification['success'],
-                    'status': notification['status'],
-                    'progress': notification['progress'],
-                    'command_id': notification.get('command_id')
-                }
+                # Ensure model_id is present
+                if 'model_id' not in model_meta:
+                    model_id = PurePosixPath(info.key).stem
+                    if not model_id:
+                        model_id = f"model-{secrets.token_hex(4)}"
+                    model_meta['model_id'] = model_id
                 
-                # Add error information if failed
-                if not notification['success']:
-                    response_msg['error'] = notification.get('error', 'Download failed')
+                # Add file information to model metadata
+                dest_path = info.destination
+                file_name = info.file_name
+                local_path = os.path.join(dest_path, file_name)
                 
-                await self.mqtt_client.publish(
-                    self.response_topic,
-                    response_msg
-                )
+                # Update model metadata with file path
+                model_meta['local_path'] = local_path
                 
-                # Mark this download as having sent a notification
-                # This will prevent it from showing up in future status reports
-                info['notification_sent'] = True
-
-                # Handle model metadata if this was a model download and it succeeded
-                if notification['success'] and 'model_meta' in info:
-                    model_meta = info['model_meta']
-                    logger.info(f"Processing model metadata for completed download {download_id}")
-                    
-                    # Ensure model_id is present
-                    if 'model_id' not in model_meta:
-                        model_id = os.path.basename(info.get('key', '')).split('.')[0]
-                        if not model_id:
-                            model_id = f"model-{str(uuid.uuid4())[:8]}"
-                        model_meta['model_id'] = model_id
-                    
-                    # Add file information to model metadata
-                    dest_path = info.get('destination', self.command_manager.default_download_dir)
-                    file_name = info.get('file_name')
-                    local_path = os.path.join(dest_path, file_name)
-                    
-                    # Update model metadata with file path
-                    model_meta['local_path'] = local_path
+                # Add the model to shadow
+                result = await self.model_shadow_manager.add_or_update_model(model_meta)
+                
+                if result.get('success', False):
+                    logger.info(f"Added model metadata to shadow for download {download_id}")
                     
-                    # Add the model to shadow
-                    result = await self.model_shadow_manager.add_or_update_model(model_meta)
+                    # Add model information to response
+                    model_response = {
+                        'event': 'model_added',
+                        'download_id': download_id,
+                        'model_id': model_meta.get('model_id'),
+                        'local_path': model_meta.get('local_path'),
+                        'command_id': notification.get('command_id')
+                    }
                     
-                    if result.get('success', False):
-                        logger.info(f"Added model metadata to shadow for download {download_id}")
-                        
-                        # Add model information to response
-                        model_response = {
-                            'event': 'model_added',
-                            'download_id': download_id,
-                            'model_id': model_meta.get('model_id'),
-                            'local_path': model_meta.get('local_path'),
-                            'command_id': notification.get('command_id')
-                        }
-                        
-                        await self.mqtt_client.publish(
-                            self.response_topic,
-                            model_response
-                        )
-                    else:
-                        logger.error(f"Failed to add model metadata to shadow: {result.get('error')}")
-                                
-                # Send detailed status if there was an error
-                if not notification['success']:
-                    error_status = {
-                        'device_id': self.device_id,
-                        'timestamp': time.time(),
-                        'download_error': {
-                            'download_id': download_id,
-                            'command_id': notification.get('command_id'),
-                            'bucket': notification['bucket'],
-                            'key': notification['key'],
-                            'status': notification['status'],
-                            'progress': notification['progress'],
-                            'message': notification.get('error', 'Download failed'),
-                            'details': notification.get('error_details', ''),
-                            'duration': notification['duration']
-                        }
+                    messages.append((self.response_topic, model_response))
+                else:
+                    logger.error(f"Failed to add model metadata to shadow: {result.get('error')}")
+            
+            # Send detailed status if there was an error
+            if not notification['success']:
+                error_status = {
+                    'device_id': self.device_id,
+                    'timestamp': time.time(),
+                    'download_error': {
+                        'download_id': download_id,
+                        'command_id': notification.get('command_id'),
+                        'bucket': notification['bucket'],
+                        'key': notification['key'],
+                        'status': notification['status'],
+                        'progress': notification['progress'],
+                        'message': notification.get('error', 'Download failed'),
+                        'details': notification.get('error_details', ''),
+                        'duration': notification['duration']
                     }
-                    await self.mqtt_client.publish(self.status_topic, error_status)
-
-            if 'error_notification' in info:
-                notification = info.pop('error_notification')
-                command_id = notification.get('command_id') or info.get('command_id')
-                
-                logger.info(f"Processing error notification with command_id: {command_id}")
-                
-                # Mark this download as having sent a notification
-                info['notification_sent'] = True
+                }
+                messages.append((self.status_topic, error_status))
                 
+            if messages:
+                await self.mqtt_client.publish_batch(messages)
+        else:
+            command_id = notification.get('command_id')
+            
+            logger.info(f"Processing error notification with command_id: {command_id}")
+            
+            # Mark this download as having sent a notification
+            self.command_manager.mark_notification_sent(download_id)
+            
+            await self.mqtt_client.publish_batch([
                 # Send to response topic - concise message
-                await self.mqtt_client.publish(
-                    self.response_topic,
-                    {
-                        'event': notification.get('event', 'download_error'),
+                (self.response_topic, {
+                    'event': notification.get('event', 'download_error'),
+                    'download_id': notification.get('download_id'),
+                    'success': False,
+                    'status': 'failed',
+                    'error': notification.get('error', 'Download failed'),
+                    'command_id': command_id
+                }),
+                # Send to status topic - detailed message
+                (self.status_topic, {
+                    'device_id': self.device_id,
+                    'timestamp': time.time(),
+                    'download_error': {
                         'download_id': notification.get('download_id'),
-                        'success': False,
+                        'command_id': command_id,
+                        'bucket': notification.get('bucket'),
+                        'key': notification.get('key'),
                         'status': 'failed',
+                        'progress': notification.get('progress', 0),
                         'error': notification.get('error', 'Download failed'),
-                        'command_id': command_id
-                    }
-                )
-                
-                # Send to status topic - detailed message
-                await self.mqtt_client.publish(
-                    self.status_topic,
-                    {
-                        'device_id': self.device_id,
-                        'timestamp': time.time(),
-                        'download_error': {
-                            'download_id': notification.get('download_id'),
-                            'command_id': command_id,
-                            'bucket': notification.get('bucket'),
-                            'key': notification.get('key'),
-                            'status': 'failed',
-                            'progress': notification.get('progress', 0),
-                            'error': notification.get('error', 'Download failed'),
-                            'error_details': notification.get('error_details', '')
-                        }
+                        'error_details': notification.get('error_details', '')
                     }
-                )
\ No newline at end of file
+                })
+            ])
\ No newline at end of file
@@ -20,6 +20,12 @@ class CommandState(Enum):
     ERROR = "error"
 
 
+# States in which a command is still in progress
+_BUSY_STATES = frozenset((CommandState.RUNNING, CommandState.PAUSED))
+# Shell metacharacters rejected in command arguments
+_UNSAFE_CHARS = frozenset('&|;$><`\\')
+
+
 class AsyncS5CommandController:
     """
     An asynchronous controller class for executing s5cmd commands with real-time
@@ -183,7 +189,7 @@ class AsyncS5CommandController:
             ValueError: If a command is already running or if invalid arguments are provided
             subprocess.SubprocessError: If the command fails to start
         """
-        if self.state == CommandState.RUNNING or self.state == CommandState.PAUSED:
+        if self.state in _BUSY_STATES:
             raise ValueError("Another command is already running")
         
         # Validate s5cmd executable path to prevent path traversal
@@ -209,7 +215,7 @@ class AsyncS5CommandController:
                 raise ValueError(f"Command argument at position {i} must be a string, got {type(arg)}")
             
             # Check for shell metacharacters and other potentially dangerous content
-            if any(char in arg for char in ['&', '|', ';', '$', '>', '<', '`', '\\']):
+            if not _UNSAFE_CHARS.isdisjoint(arg):
                 raise ValueError(f"Command argument contains unsafe characters: {arg}")
             
             # Additional validation for s3 paths
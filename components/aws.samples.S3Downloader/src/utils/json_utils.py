@@ -0,0 +1,72 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON bytes
+    
+    Uses orjson when available, which produces compact bytes directly without
+    an intermediate str. The standard library fallback is configured to match:
+    no whitespace between tokens and non-ASCII characters left unescaped.
+    
+    Args:
+        obj: JSON-serializable object
+        
+    Returns:
+        JSON document as bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize an object to a compact JSON string
+    
+    Args:
+        obj: JSON-serializable object
+        
+    Returns:
+        JSON document as str
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """
+    Parse a JSON document from bytes or str
+    
+    Args:
+        data: JSON document
+        
+    Returns:
+        Parsed object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class LazyJson:
+    """
+    Defer JSON serialization of an object until it is formatted
+    
+    Intended for %-style logging arguments so the object is only
+    serialized when the record is actually emitted.
+    """
+    __slots__ = ('obj',)
+    
+    def __init__(self, obj: Any):
+        self.obj = obj
+        
+    def __str__(self) -> str:
+        return dumps(self.obj)